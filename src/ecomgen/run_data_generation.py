@@ -2,11 +2,14 @@ import os
 import sys
 import argparse
 import csv
+import functools
 import importlib
+import numpy as np
 import pandas as pd
 
 from faker import Faker
 from generators.inject_mess import run_injection
+from generators.generator_common_utils import get_customers_by_id
 from tests.qa_tests import run_all_tests
 from tests.big_audit import run_big_audit
 from utils.config import Config
@@ -14,7 +17,31 @@ from generators.generator_customers import generate_customers
 from datetime import datetime, timedelta
 
 import random
-import copy
+
+# Parent tables whose rows are patched in memory by a later item table. Their first CSV write
+# is deferred until the item table has run so each file is written once, with final values.
+PATCHED_BY_ITEM_TABLE = {"orders": "order_items", "returns": "return_items"}
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(path):
+    """Resolve a dotted 'module.function' path to its callable; repeated paths reuse the first lookup."""
+    module_name, func_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def apply_row_updates(rows, key, updates):
+    """
+    Patch cached rows in place from a {key value: {column: value}} mapping.
+    Rows are indexed by key once and only the updated ones are touched; unknown keys are ignored.
+    """
+    if not updates:
+        return
+    rows_by_key = {row[key]: row for row in rows}
+    for key_value, patch in updates.items():
+        row = rows_by_key.get(key_value)
+        if row is not None:
+            row.update(patch)
 
 
 def save_table_to_csv(rows, columns, csv_path):
@@ -22,13 +49,18 @@ def save_table_to_csv(rows, columns, csv_path):
     Save the generated rows to a CSV file.
     The 'columns' argument explicitly defines the order of columns in the CSV.
     """
-    if isinstance(rows, pd.DataFrame):
-        rows = rows.to_dict(orient='records')
-    with open(csv_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=columns, extrasaction='ignore')
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
+    # Both paths write through one 1 MiB buffered handle, so large tables flush in few syscalls.
+    with open(csv_path, 'w', newline='', buffering=1 << 20) as csvfile:
+        if isinstance(rows, pd.DataFrame):
+            # Let pandas' C writer handle frames directly; reindex fills any missing column with blanks.
+            # Use the csv module's line terminator so both paths produce the same file layout.
+            rows.reindex(columns=columns).to_csv(csvfile, index=False, lineterminator='\r\n')
+            return
+        columns = tuple(columns)
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        # Project each row onto the column order and emit them all in one writerows call
+        writer.writerows([row.get(col) for col in columns] for row in rows)
 
 
 def generate_load_script(tables_config, output_path, output_dir):
@@ -128,7 +160,12 @@ def _calculate_and_apply_earned_status(lookup_cache, config, output_dir):
         print("  Skipping earned status calculation: no spend thresholds found in config.")
         return
 
-    orders_df = pd.DataFrame(lookup_cache.get("orders", []))
+    # Only the spend columns are needed, so build the orders frame column-wise from those two.
+    orders = lookup_cache.get("orders", [])
+    orders_df = pd.DataFrame({
+        'customer_id': [order['customer_id'] for order in orders],
+        'gross_total': [order['gross_total'] for order in orders],
+    })
     customers_df = pd.DataFrame(lookup_cache.get("customers", []))
 
     if orders_df.empty or customers_df.empty:
@@ -181,6 +218,7 @@ def main():
                         choices=["baseline", "none", "light_mess", "medium_mess", "heavy_mess"],
                         help='Level of messiness to inject into data post-generation.')
     parser.add_argument('--debug', action='store_true', help='Enable detailed debug logging for QA tests')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for a reproducible run (random by default)')
     args = parser.parse_args()
 
     if args.messiness_level == "none":
@@ -197,6 +235,12 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     print(f"📁 Output directory: {output_dir}")
 
+    # One seedable numpy Generator is shared by every generator through the lookup cache.
+    # With --seed, Python's random module and Faker are seeded too so the whole run repeats.
+    if args.seed is not None:
+        random.seed(args.seed)
+        Faker.seed(args.seed)
+    rng = np.random.default_rng(args.seed)
     faker_instance = Faker()
 
     # --- NEW: Define Global Date Range for Data Generation ---
@@ -209,16 +253,15 @@ def main():
     # Store in lookup_cache for access by generators
     lookup_cache = {
         "global_start_date": global_start_date,
-        "global_end_date": global_end_date
+        "global_end_date": global_end_date,
+        "rng": rng,
     }
 
     # Prepare row generators from config
     row_generators = {}
     if config.row_generators:
         for table_name, generator_path in config.row_generators.items():
-            module_name, func_name = generator_path.rsplit('.', 1)
-            module = importlib.import_module(module_name)
-            row_generators[table_name] = getattr(module, func_name)
+            row_generators[table_name] = _resolve(generator_path)
 
     # Generate lookup catalogs as defined
     lookup_config = config.lookup_config
@@ -231,9 +274,7 @@ def main():
                 continue
             
             try:
-                module_name, func_name = generator_path.rsplit('.', 1)
-                module = importlib.import_module(module_name)
-                generator_func = getattr(module, func_name)
+                generator_func = _resolve(generator_path)
             except Exception as e:
                 print(f"❌ Failed to import generator for lookup '{lookup_name}': {e}")
                 continue
@@ -249,7 +290,8 @@ def main():
                         config=config,
                         guest_shopper_pct=guest_shopper_pct,
                         global_start_date=lookup_cache.get("global_start_date"),
-                        global_end_date=lookup_cache.get("global_end_date")
+                        global_end_date=lookup_cache.get("global_end_date"),
+                        rng=rng,
                     )
                     customers = lookup_cache["customers"]
                     if not customers:
@@ -286,6 +328,16 @@ def main():
         print("❌ Fatal error: No tables defined in the YAML config.")
         raise ValueError("Config is missing the required 'tables' section or it's empty.")
 
+    table_names = {table.get('name') for table in tables}
+    # Deferred parent-table writes, keyed by table name: (columns, csv_path)
+    pending_csv = {}
+
+    def flush_pending_csv(name):
+        if name in pending_csv:
+            columns, csv_path = pending_csv.pop(name)
+            save_table_to_csv(lookup_cache[name], columns, csv_path)
+            print(f"💾 Saved CSV for table '{name}' ➜ {csv_path}")
+
     for table in tables:
         table_name = table.get('name')
         columns = table.get('columns', [])
@@ -313,9 +365,7 @@ def main():
                 cart_items, cart_updates = row_generators[table_name](columns, num_rows, faker_instance, lookup_cache, config)
                 rows = cart_items
                 # Apply updates to the cached carts
-                for cart in lookup_cache.get('shopping_carts', []):
-                    if cart['cart_id'] in cart_updates:
-                        cart.update(cart_updates[cart['cart_id']])
+                apply_row_updates(lookup_cache.get('shopping_carts', []), 'cart_id', cart_updates)
             elif table_name == 'returns':
                 # Pass global_end_date to returns generator for end boundary
                 rows = row_generators[table_name](columns, num_rows, faker_instance, lookup_cache, config, global_end_date)
@@ -326,17 +376,16 @@ def main():
                 # The generator now handles its own de-duplication and returns clean data.
                 rows, order_updates = row_generators[table_name](columns, None, faker_instance, lookup_cache, config)
 
-                # Apply updates to the cached orders
-                for order in lookup_cache.get('orders', []):
-                    if order['order_id'] in order_updates:
-                        order.update(order_updates[order['order_id']])
+                # Orders are written with their final totals, so there is normally nothing to patch.
+                apply_row_updates(lookup_cache.get('orders', []), 'order_id', order_updates)
             elif table_name == 'return_items':
                 return_items, return_updates = row_generators[table_name](columns, num_rows, faker_instance, lookup_cache, config)
                 rows = return_items
                 # Apply updates to the cached returns
-                for ret in lookup_cache.get('returns', []):
-                    if ret['return_id'] in return_updates:
-                        ret['refunded_amount'] = return_updates[ret['return_id']]
+                apply_row_updates(
+                    lookup_cache.get('returns', []), 'return_id',
+                    {return_id: {'refunded_amount': amount} for return_id, amount in return_updates.items()},
+                )
             else:
                 rows = row_generators[table_name](columns, num_rows, faker_instance, lookup_cache, config)
             actual_count = len(rows) if (rows is not None and not (hasattr(rows, 'empty') and rows.empty)) else 0
@@ -354,8 +403,12 @@ def main():
 
         if rows is not None and not (hasattr(rows, 'empty') and rows.empty):
             csv_path = os.path.join(output_dir, f"{table_name}.csv")
-            save_table_to_csv(rows, [col['name'] for col in columns], csv_path)
-            print(f"💾 Saved CSV for table '{table_name}' ➜ {csv_path}")
+            if PATCHED_BY_ITEM_TABLE.get(table_name) in table_names:
+                pending_csv[table_name] = ([col['name'] for col in columns], csv_path)
+                print(f"⏳ Deferring CSV for table '{table_name}' until its item table has patched it")
+            else:
+                save_table_to_csv(rows, [col['name'] for col in columns], csv_path)
+                print(f"💾 Saved CSV for table '{table_name}' ➜ {csv_path}")
             lookup_cache[table_name] = rows
         else:
             print(f"Warning: No rows generated for table '{table_name}', skipping CSV save.")
@@ -371,7 +424,7 @@ def main():
             carts = lookup_cache.get('shopping_carts', [])
 
             if carts:
-                customers_by_id = {c['customer_id']: c for c in lookup_cache.get('customers', [])}
+                customers_by_id = get_customers_by_id(lookup_cache)
                 converted_carts = []
                 customers_with_orders = set()
                 abandoned_carts_to_process = []
@@ -395,7 +448,7 @@ def main():
                         abandoned_carts_to_process.append(cart)
 
                 # Now process the abandoned carts to set final status (abandoned vs emptied)
-                cart_items_df = pd.DataFrame(lookup_cache.get('cart_items', []))
+                cart_items = lookup_cache.get('cart_items', [])
                 cart_ids_to_empty = set()
 
                 for cart in abandoned_carts_to_process:
@@ -406,13 +459,15 @@ def main():
                     else:
                         cart['status'] = 'abandoned'
 
-                # Filter out items from emptied carts
-                if not cart_items_df.empty and cart_ids_to_empty:
-                    cart_items_df = cart_items_df[~cart_items_df['cart_id'].isin(cart_ids_to_empty)]
-                    lookup_cache['cart_items'] = cart_items_df.to_dict(orient='records')
+                # Filter out items from emptied carts. The cached rows are filtered directly as a list
+                # rather than round-tripped through a DataFrame, which held a second full copy of the table.
+                if cart_items and cart_ids_to_empty:
+                    lookup_cache['cart_items'] = [item for item in cart_items if item['cart_id'] not in cart_ids_to_empty]
                     print(f"  Emptied {len(cart_ids_to_empty)} abandoned carts.")
 
                 lookup_cache['converted_carts'] = converted_carts
+                # Carts were visited in created_at order, so the orders generator can skip its sort.
+                lookup_cache['converted_carts_sorted'] = True
                 total_carts = len(carts)
                 actual_conversion_rate = len(converted_carts) / total_carts if total_carts > 0 else 0
                 print(f"  {len(converted_carts)} of {total_carts} carts converted into orders (Target: {conversion_rate:.2%}, Actual: {actual_conversion_rate:.2%}).")
@@ -421,10 +476,14 @@ def main():
                 resave_patched_table("cart_items", lookup_cache, config, output_dir)
 
         if table_name == "return_items":
-            resave_patched_table("returns", lookup_cache, config, output_dir)
+            flush_pending_csv("returns")
 
         if table_name == "order_items":
-            resave_patched_table("orders", lookup_cache, config, output_dir)
+            flush_pending_csv("orders")
+
+    # Item tables that produced no rows skip the flush above; write their parents unpatched.
+    for name in list(pending_csv):
+        flush_pending_csv(name)
 
     # --- Post-Processing: Calculate Earned Tiers/CLV ---
     _calculate_and_apply_earned_status(lookup_cache, config, output_dir)
@@ -440,14 +499,15 @@ def main():
     # Inject messiness after all CSVs are saved, before QA/Audit
     print("🔁 Running post-export messiness injection...")
     try:
-        run_injection(data_dir=output_dir, messiness_level=messiness_level, config_path=str(config.yaml_path))
+        run_injection(data_dir=output_dir, messiness_level=messiness_level, seed=args.seed, config=config)
         print("✅ Messiness injection completed successfully.")
     except Exception as e:
         print(f"❌ Messiness injection failed: {e}")
 
+    # QA reads the CSVs as-is; the big audit re-reads them with its own typed read options
     print("🧪 Running QA tests to validate output...")
     try:
-        run_all_tests(data_dir=output_dir, messiness=messiness_level, debug=args.debug)
+        run_all_tests(data_dir=output_dir, messiness=messiness_level, debug=args.debug, config=config)
         print("✅ QA tests completed successfully.")
     except Exception as e:
         print(f"❌ QA tests failed with error: {e}")
@@ -10,7 +10,7 @@ from collections import defaultdict
 import numpy as np
 from datetime import datetime, timedelta
 from faker import Faker
-from .generator_common_utils import get_param, get_vocab
+from .generator_common_utils import get_param, get_vocab, get_customers_by_id, get_rng
 from utils.date_utils import safe_date_between
 
 def generate_cart_id(faker_instance: Faker) -> str:
@@ -31,6 +31,7 @@ def generate_shopping_carts(columns: List[str], num_rows: int, faker_instance: F
 
     global_start_date = lookup_cache.get("global_start_date")
     global_end_date = lookup_cache.get("global_end_date")
+    rng = get_rng(lookup_cache)
 
     time_to_first_cart_range = config.get_parameter('time_to_first_cart_days_range', [1, 30])
     repeat_settings = config.get_parameter('repeat_purchase_settings', {})
@@ -121,12 +122,12 @@ def generate_shopping_carts(columns: List[str], num_rows: int, faker_instance: F
         sigma = delay_config.get('sigma', 0.6)
  
         # Generate the number of organic repeat visits from the Poisson distribution.
-        num_repeat_visits = np.random.poisson(lam=avg_repeat_visits_lambda)
+        num_repeat_visits = rng.poisson(lam=avg_repeat_visits_lambda)
 
         for i in range(num_repeat_visits):
             mean_delay = (delay_range[0] + delay_range[1]) / 2
             mu = np.log(mean_delay) - (sigma**2 / 2)
-            delay = int(np.random.lognormal(mean=mu, sigma=sigma))
+            delay = int(rng.lognormal(mean=mu, sigma=sigma))
             delay = max(delay_range[0], delay) # Ensure delay is at least the minimum
             next_cart_date = last_cart_date + timedelta(days=delay)
 
@@ -268,7 +269,7 @@ def generate_cart_items(columns: List[str], num_rows: int, faker_instance: Faker
         raise ValueError("global_end_date not found in lookup_cache. It should be set in the main run script.")
 
     # Create a customer tier lookup for quick access to apply behavioral rules.
-    customers_by_id = {c['customer_id']: c for c in lookup_cache.get('customers', [])}
+    customers_by_id = get_customers_by_id(lookup_cache)
 
     # Get category preference settings to influence product choices.
     category_prefs_by_channel = config.get_parameter('category_preference_by_signup_channel', {})
@@ -277,6 +278,18 @@ def generate_cart_items(columns: List[str], num_rows: int, faker_instance: Faker
         # Fallback if vocab is missing, though this should be caught by a linter.
         all_categories = list(get_vocab(config, 'category_vocab', {}).keys())
 
+    # Resolve each signup channel's category weights once. The preference keys are lowercase in
+    # the config (e.g., 'electronics'); channels without any preference use uniform weights (None).
+    category_weights_by_channel = {}
+    for channel, prefs in category_prefs_by_channel.items():
+        weights = [prefs.get(cat.lower(), 1.0) for cat in all_categories]
+        category_weights_by_channel[channel] = weights if any(w > 1.0 for w in weights) else None
+
+    # Group the catalog by category once instead of filtering it for every item.
+    products_by_category = defaultdict(list)
+    for p in products:
+        products_by_category[p['category']].append(p)
+
     # Get tier-based cart behavior settings to stratify cart size and item quantities.
     cart_behavior_by_tier = config.get_parameter('cart_behavior_by_tier', {})
     default_item_count_range = config.get_table_config("cart_items").get("item_count_range", [1, 8])
@@ -303,19 +316,14 @@ def generate_cart_items(columns: List[str], num_rows: int, faker_instance: Faker
         cart_total = 0.0
         last_item_added_at = created_at_dt
         
-        # Get category preferences for this customer's channel
-        prefs = category_prefs_by_channel.get(signup_channel, {})
-        # Build weights, ensuring all categories have a weight (default to 1.0).
-        # The preference keys are lowercase in the config (e.g., 'electronics').
-        category_weights = [prefs.get(cat.lower(), 1.0) for cat in all_categories]
-        if not any(w > 1.0 for w in category_weights): # If no prefs, use uniform weights
-            category_weights = None
+        # Get category preference weights for this customer's channel
+        category_weights = category_weights_by_channel.get(signup_channel)
 
         for _ in range(num_items_in_cart):
             # First, select a category based on channel preference
             chosen_category = random.choices(all_categories, weights=category_weights, k=1)[0]
             # Then, select a product from that category
-            products_in_category = [p for p in products if p['category'] == chosen_category]
+            products_in_category = products_by_category.get(chosen_category)
             if not products_in_category:
                 product = random.choice(products) # Fallback to any product
             else:
@@ -3,21 +3,65 @@
 Shared utility functions for story_generators modules.
 """
 
-import random
-from typing import Any
+from typing import Any, Dict, List
+import numpy as np
 from faker import Faker
 
 
-def assign_agent(order_channel: str, config: Any) -> str:
-    """Assigns an agent ID for Phone orders/returns if agent pool enabled; otherwise 'ONLINE'."""
-    if order_channel == "Phone":
-        agents = get_vocab(config, "agent_pool", {}).get("agents", [])
-        if not agents:
-            raise ValueError(
-                "Agent pool is empty or missing in config but order_channel is 'Phone'."
-            )
-        return random.choice([agent["id"] for agent in agents])
-    return "ONLINE"
+def get_agent_ids(config: Any) -> List[str]:
+    """Returns the configured agent IDs, raising if the pool is empty since Phone orders need one."""
+    agents = get_vocab(config, "agent_pool", {}).get("agents", [])
+    if not agents:
+        raise ValueError(
+            "Agent pool is empty or missing in config but order_channel is 'Phone'."
+        )
+    return [agent["id"] for agent in agents]
+
+
+def get_rng(lookup_cache: Dict) -> np.random.Generator:
+    """Returns the run's shared numpy Generator from the lookup cache, creating an unseeded one if absent."""
+    rng = lookup_cache.get("rng")
+    if rng is None:
+        rng = lookup_cache["rng"] = np.random.default_rng()
+    return rng
+
+
+def generate_unique_ids(prefix: str, count: int, digits: int = 8, rng: np.random.Generator = None) -> List[str]:
+    """
+    Generates `count` distinct random IDs such as 'ORD-01234567'.
+
+    Pass the run's seeded generator for reproducible IDs. Memory scales with `count`,
+    not with the 10**digits ID space.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    id_space = 10 ** digits
+    if count > id_space:
+        raise ValueError(f"Cannot draw {count} unique IDs from a space of {id_space}.")
+    if 2 * count >= id_space:
+        # The space is small relative to count, so a permutation of it costs about the same.
+        id_nums = rng.permutation(id_space)[:count]
+    else:
+        # Over-draw by ~5%, dedupe, and top up until there are enough; then shuffle and trim.
+        # A random subset of a deduped uniform sample is itself a uniform sample without replacement.
+        id_nums = np.empty(0, dtype=np.int64)
+        while len(id_nums) < count:
+            needed = count - len(id_nums)
+            draws = rng.integers(0, id_space, size=needed + needed // 20 + 1, dtype=np.int64)
+            id_nums = np.unique(np.concatenate([id_nums, draws]))
+        id_nums = rng.permutation(id_nums)[:count]
+    return np.char.mod(f"{prefix}%0{digits}d", id_nums).tolist()
+
+
+def get_customers_by_id(lookup_cache: Dict) -> Dict[str, Dict]:
+    """Returns a customer_id -> customer index of the cached customers, built once per customers list."""
+    customers = lookup_cache.get("customers", [])
+    cached = lookup_cache.get("customers_by_id")
+    # Rebuild if the customers list was replaced (e.g. by the earned-status post-processing).
+    if cached is None or cached[0] is not customers:
+        cached = (customers, {c["customer_id"]: c for c in customers})
+        lookup_cache["customers_by_id"] = cached
+    return cached[1]
 
 
 def generate_address(faker: Faker) -> str:
@@ -11,12 +11,11 @@ Functions:
 - customer_lookup_generator: Retrieve pre-generated customer records from a cache.
 """
 
-import random
+import numpy as np
 from datetime import datetime, timedelta
-from .generator_common_utils import get_vocab, get_param, generate_address
-from utils.date_utils import safe_date_between
+from .generator_common_utils import generate_address
 
-def generate_customers(num_customers=1000, faker=None, config=None, guest_shopper_pct=0.4, global_start_date: datetime.date = None, global_end_date: datetime.date = None):
+def generate_customers(num_customers=1000, faker=None, config=None, guest_shopper_pct=0.4, global_start_date: datetime.date = None, global_end_date: datetime.date = None, rng: np.random.Generator = None):
     """
     Generate a list of synthetic customer records with enriched attributes.
 
@@ -27,17 +26,22 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
         guest_shopper_pct (float, optional): Fraction of customers to generate as guest shoppers.
         global_start_date (datetime.date, optional): Global start date for signup date range.
         global_end_date (datetime.date, optional): Global end date for signup date range.
+        rng (np.random.Generator, optional): Random generator used for all draws. Pass a seeded
+            generator for reproducible output; a fresh one is created if omitted.
 
     Returns:
         List[dict]: List of customer records with enriched data.
     """
-    # The 'config' parameter is now the main Config object.
-    # Get parameters from the config object for consistency.
+    # The 'config' parameter is now the main Config object. Resolve its sections once and
+    # read from the local dicts below instead of going back through the Config properties.
+    parameters = config.parameters
+    vocab = config.vocab
+    raw_config = config.raw_config
     customer_lookup_params = config.lookup_config.get('customers', {})
     min_age = customer_lookup_params.get('min_age', 18)
     max_age = customer_lookup_params.get('max_age', 70)
-    signup_years = get_param(config, 'signup_years', 1) # Default to 1 year, which can be overridden by YAML.
-    customer_id_start = get_param(config, 'customer_id_start', None)
+    signup_years = parameters.get('signup_years', 1) # Default to 1 year, which can be overridden by YAML.
+    customer_id_start = parameters.get('customer_id_start', None)
 
     # The passed global_end_date is the anchor for all date generation.
     # If not provided, default to today.
@@ -45,15 +49,19 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
         global_end_date = datetime.now().date()
     # Customer signups can happen over a longer history than orders.
     signup_start_date = global_end_date - timedelta(days=signup_years * 365)
+    signup_window_days = (global_end_date - signup_start_date).days
+
+    if rng is None:
+        rng = np.random.default_rng()
 
-    # Use get_vocab and get_param for vocab/constants with fallbacks
-    genders = get_vocab(config, 'genders', ['Male', 'Female', 'Unknown'])
-    loyalty_tiers = get_vocab(config, 'loyalty_tiers', ['Bronze', 'Silver', 'Gold', 'Platinum'])
-    signup_channel_options = get_vocab(config, 'signup_channels', ['Website', 'Phone'])
+    # Vocab and constants, with fallbacks
+    genders = vocab.get('genders', ['Male', 'Female', 'Unknown'])
+    loyalty_tiers = vocab.get('loyalty_tiers', ['Bronze', 'Silver', 'Gold', 'Platinum'])
+    signup_channel_options = vocab.get('signup_channels', ['Website', 'Phone'])
     # NEW: Get signup channel distribution from parameters to model acquisition funnel.
-    signup_channel_dist_config = get_param(config, 'signup_channel_distribution')
+    signup_channel_dist_config = parameters.get('signup_channel_distribution')
 
-    clv_map = config.raw_config.get('clv_map', {
+    clv_map = raw_config.get('clv_map', {
         # NEW: Add default mapping for None tier
         None: 'Low',
         'Bronze': 'Low',
@@ -64,14 +72,17 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
     gender_unknown_prob = customer_lookup_params.get('gender_unknown_prob', 0.05)
 
     # NEW: Parameters for biased loyalty tier assignment
-    loyalty_dist_by_channel = get_param(config, 'loyalty_distribution_by_channel', {})
+    loyalty_dist_by_channel = parameters.get('loyalty_distribution_by_channel', {})
     default_loyalty_dist = loyalty_dist_by_channel.get('default') # Let it be None if not set
-    no_tier_probability = get_param(config, 'no_tier_probability', 0.1)
+    no_tier_probability = parameters.get('no_tier_probability', 0.1)
 
-    customer_status_options = get_vocab(config, 'customer_status_options', ["Active", "Inactive", "Dormant"])
-    customer_status_probs = get_param(config, 'customer_status_probs', [0.7, 0.2, 0.1])
-    email_verified_prob = get_param(config, 'email_verified_prob', 0.8)
-    marketing_opt_in_prob = get_param(config, 'marketing_opt_in_prob', 0.5)
+    customer_status_options = vocab.get('customer_status_options', ["Active", "Inactive", "Dormant"])
+    customer_status_probs = parameters.get('customer_status_probs', [0.7, 0.2, 0.1])
+    email_verified_prob = parameters.get('email_verified_prob', 0.8)
+    marketing_opt_in_prob = parameters.get('marketing_opt_in_prob', 0.5)
+    # Optional shared pools for registered customers' addresses and names; None gives every customer its own draw.
+    address_pool_size = parameters.get('regular_address_pool_size')
+    name_pool_size = parameters.get('regular_name_pool_size')
 
     # Determine counts for regular and guest customers
     num_regular_customers = int(num_customers * (1 - guest_shopper_pct))
@@ -79,7 +90,7 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
 
     # Starting ID for regular customers
     if customer_id_start is None:
-        start_id = random.randint(1000, 9999)
+        start_id = int(rng.integers(1000, 10000))
     else:
         start_id = customer_id_start
 
@@ -90,68 +101,128 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
         except ImportError:
             raise ImportError("Faker is required for date/email/address generation.")
 
-    customers = []
-
-    for i in range(num_regular_customers):
-        # Gender with unknown prob
-        if random.random() < gender_unknown_prob:
-            gender = 'Unknown'
+    # Resolve the signup channel distribution once. Fall back to a uniform draw over the vocab.
+    if signup_channel_dist_config:
+        channels = list(signup_channel_dist_config.keys())
+        channel_weights = np.asarray(list(signup_channel_dist_config.values()), dtype=float)
+    else:
+        channels = list(signup_channel_options)
+        channel_weights = np.ones(len(channels))
+    channel_cdf = np.cumsum(channel_weights) / channel_weights.sum()
+    channel_cdf[-1] = 1.0
+
+    # Precompute a (num_channels, num_tiers) table of loyalty tier CDFs, one row per channel.
+    # Channels with a missing or invalid distribution fall back to a uniform draw across tiers.
+    num_tiers = len(loyalty_tiers)
+    channel_loyalty_cdf = np.empty((len(channels), num_tiers))
+    for channel_idx, channel in enumerate(channels):
+        channel_dist = loyalty_dist_by_channel.get(channel, default_loyalty_dist)
+        if channel_dist and len(channel_dist) == num_tiers:
+            tier_weights = np.asarray(channel_dist, dtype=float)
         else:
-            gender = random.choice(genders)
-
-        # Basic fields
-        customer_id_num = start_id + i
-        signup_date_dt = safe_date_between(start_date=signup_start_date, end_date=global_end_date)
-
-        # NEW: Assign signup channel based on configured distribution.
-        if signup_channel_dist_config:
-            channels = list(signup_channel_dist_config.keys())
-            weights = list(signup_channel_dist_config.values())
-            signup_channel = random.choices(channels, weights=weights, k=1)[0]
-        else: # Fallback to uniform distribution if not configured.
-            signup_channel = random.choice(signup_channel_options)
+            tier_weights = np.ones(num_tiers)
+        channel_loyalty_cdf[channel_idx] = np.cumsum(tier_weights) / tier_weights.sum()
+    channel_loyalty_cdf[:, -1] = 1.0
+
+    # Draw every channel and tier up front: a gather of each customer's CDF row followed by
+    # an inverse-CDF lookup. The last index is a sentinel for customers without a tier.
+    channel_idx_draws = np.searchsorted(channel_cdf, rng.random(num_regular_customers), side='right')
+    tier_cdfs = channel_loyalty_cdf[channel_idx_draws]
+    tier_idx_draws = (rng.random(num_regular_customers)[:, None] < tier_cdfs).argmax(axis=1)
+    tier_idx_draws = np.where(rng.random(num_regular_customers) < no_tier_probability, num_tiers, tier_idx_draws)
+    signup_channel_draws = [channels[idx] for idx in channel_idx_draws.tolist()]
+    tier_choices = list(loyalty_tiers) + [None]
+    loyalty_tier_draws = [tier_choices[idx] for idx in tier_idx_draws.tolist()]
+
+    # Format every customer ID in one vectorized pass rather than one f-string per row.
+    customer_ids = np.char.mod('CUST-%04d', np.arange(start_id, start_id + num_regular_customers)).tolist()
+
+    # Batch the remaining per-customer categorical draws so the loop only indexes into them.
+    unknown_gender_draws = (rng.random(num_regular_customers) < gender_unknown_prob).tolist()
+    gender_idx_draws = rng.integers(len(genders), size=num_regular_customers).tolist()
+    gender_draws = [
+        'Unknown' if is_unknown else genders[idx]
+        for is_unknown, idx in zip(unknown_gender_draws, gender_idx_draws)
+    ]
+    age_draws = rng.integers(min_age, max_age + 1, size=num_regular_customers).tolist()
+    status_cum_weights = np.cumsum(np.asarray(customer_status_probs, dtype=float))
+    status_idx_draws = np.searchsorted(
+        status_cum_weights, rng.random(num_regular_customers) * status_cum_weights[-1], side='right'
+    )
+    # A uniform scaled by the float total can round up to the total itself; clamp to the last status.
+    status_idx_draws = np.minimum(status_idx_draws, len(status_cum_weights) - 1)
+    status_draws = [customer_status_options[idx] for idx in status_idx_draws.tolist()]
+    # By default each registered customer gets its own address. A configured pool smaller than the
+    # customer count is shared instead, trading repeated addresses for fewer Faker calls.
+    if address_pool_size is None or address_pool_size >= num_regular_customers:
+        address_draws = [generate_address(faker) for _ in range(num_regular_customers)]
+    else:
+        address_pool = [generate_address(faker) for _ in range(max(1, address_pool_size))]
+        address_draws = [address_pool[idx] for idx in rng.integers(len(address_pool), size=num_regular_customers).tolist()]
+    # Both Bernoulli flags come from a single (N, 2) uniform draw; .tolist() yields plain bools.
+    flag_draws = rng.random((num_regular_customers, 2)) < [email_verified_prob, marketing_opt_in_prob]
+    email_verified_draws = flag_draws[:, 0].tolist()
+    marketing_opt_in_draws = flag_draws[:, 1].tolist()
+
+    # Names and email domains work the same way: one Faker draw per customer unless a smaller
+    # pool is configured, in which case pooled entries are shared and name/email collisions rise.
+    # Lowercased name parts are computed once per pool entry so each email is a plain concatenation.
+    if name_pool_size is None or name_pool_size >= num_regular_customers:
+        name_pool_size = num_regular_customers
+        first_name_idx_draws = last_name_idx_draws = email_domain_draws = range(num_regular_customers)
+    else:
+        name_pool_size = max(1, name_pool_size)
+        first_name_idx_draws = rng.integers(name_pool_size, size=num_regular_customers).tolist()
+        last_name_idx_draws = rng.integers(name_pool_size, size=num_regular_customers).tolist()
+        email_domain_draws = rng.integers(name_pool_size, size=num_regular_customers).tolist()
+    first_name_pool = [faker.first_name() for _ in range(name_pool_size)]
+    last_name_pool = [faker.last_name() for _ in range(name_pool_size)]
+    email_domain_pool = [faker.free_email_domain() for _ in range(name_pool_size)]
+    first_names_lc = [name.lower() for name in first_name_pool]
+    last_names_lc = [name.lower() for name in last_name_pool]
+
+    # Draw signup and loyalty enrollment dates as day offsets and render them to ISO strings
+    # in one datetime64 cast. Enrollment falls between signup and the global end date.
+    signup_offsets = rng.integers(0, signup_window_days + 1, size=num_regular_customers)
+    signup_dates = np.datetime64(signup_start_date, 'D') + signup_offsets
+    enroll_dates = signup_dates + rng.integers(0, signup_window_days - signup_offsets + 1)
+    signup_date_strs = signup_dates.astype(str).tolist()
+    enroll_date_strs = enroll_dates.astype(str).tolist()
+
+    # Size the result list up front; guests fill the tail after the registered customers.
+    customers = [None] * num_customers
 
-        # NEW: Assign loyalty tier based on channel-specific distribution
-        loyalty_tier = None
-        if random.random() > no_tier_probability:
-            # This customer will be assigned a tier
-            channel_dist = loyalty_dist_by_channel.get(signup_channel, default_loyalty_dist)
-            if channel_dist and len(channel_dist) == len(loyalty_tiers):
-                # Use the configured distribution
-                loyalty_tier = random.choices(loyalty_tiers, weights=channel_dist, k=1)[0]
-            else:
-                # Fallback to random choice if config is missing or invalid
-                loyalty_tier = random.choice(loyalty_tiers)
+    for i in range(num_regular_customers):
+        # Signup channel and channel-biased loyalty tier were drawn in bulk above.
+        signup_channel = signup_channel_draws[i]
+        loyalty_tier = loyalty_tier_draws[i]
 
         # Conditional loyalty enrollment date
-        if loyalty_tier:
-            loyalty_enroll_date = safe_date_between(start_date=signup_date_dt, end_date=global_end_date).isoformat()
-        else:
-            loyalty_enroll_date = None
+        loyalty_enroll_date = enroll_date_strs[i] if loyalty_tier else None
         # Per governance, address is required. For baseline, billing matches mailing.
-        mailing_address = generate_address(faker)
+        mailing_address = address_draws[i]
         billing_address = mailing_address
 
         # CLV bucket based on loyalty tier (now handles None tier)
         clv_bucket = clv_map.get(loyalty_tier, None)
 
-        first_name = faker.first_name()
-        last_name = faker.last_name()
+        first_idx = first_name_idx_draws[i]
+        last_idx = last_name_idx_draws[i]
 
         customer = {
-            'customer_id': f"CUST-{customer_id_num:04d}",
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': f"{first_name.lower()}.{last_name.lower()}@{faker.free_email_domain()}",
+            'customer_id': customer_ids[i],
+            'first_name': first_name_pool[first_idx],
+            'last_name': last_name_pool[last_idx],
+            'email': first_names_lc[first_idx] + '.' + last_names_lc[last_idx] + '@' + email_domain_pool[email_domain_draws[i]],
             'phone_number': faker.phone_number(),
-            'age': random.randint(min_age, max_age),
-            'gender': gender,
+            'age': age_draws[i],
+            'gender': gender_draws[i],
             'loyalty_tier': loyalty_tier,
             'initial_loyalty_tier': loyalty_tier, # Set initial tier
-            'signup_date': signup_date_dt.isoformat(),
-            'customer_status': random.choices(customer_status_options, customer_status_probs)[0],
-            'email_verified': random.random() < email_verified_prob,
-            'marketing_opt_in': random.random() < marketing_opt_in_prob,
+            'signup_date': signup_date_strs[i],
+            'customer_status': status_draws[i],
+            'email_verified': email_verified_draws[i],
+            'marketing_opt_in': marketing_opt_in_draws[i],
             'loyalty_enrollment_date': loyalty_enroll_date,
             'signup_channel': signup_channel,
             'mailing_address': mailing_address,
@@ -160,12 +231,12 @@ def generate_customers(num_customers=1000, faker=None, config=None, guest_shoppe
             'is_guest': False,
         }
 
-        customers.append(customer)
+        customers[i] = customer
 
     # Generate guest customers and append
     # Pass the main config object down to the guest generator.
-    guest_customers = generate_guest_customers(num_guest_customers, faker=faker, config=config, start_guest_id=100000, global_start_date=global_start_date, global_end_date=global_end_date)
-    customers.extend(guest_customers)
+    guest_customers = generate_guest_customers(num_guest_customers, faker=faker, config=config, start_guest_id=100000, global_start_date=global_start_date, global_end_date=global_end_date, rng=rng)
+    customers[num_regular_customers:] = guest_customers
 
     return customers
 
@@ -189,7 +260,7 @@ def customer_lookup_generator(columns, num_rows, faker, lookup_cache):
 
 
 # New function: generate_guest_customers
-def generate_guest_customers(num_guest_customers, faker=None, config=None, start_guest_id=100000, global_start_date: datetime.date = None, global_end_date: datetime.date = None):
+def generate_guest_customers(num_guest_customers, faker=None, config=None, start_guest_id=100000, global_start_date: datetime.date = None, global_end_date: datetime.date = None, rng: np.random.Generator = None):
     """
     Generate fully populated guest customer records with unique guest customer IDs.
 
@@ -200,10 +271,13 @@ def generate_guest_customers(num_guest_customers, faker=None, config=None, start
         start_guest_id (int, optional): Starting number for guest customer IDs to avoid collision.
         global_start_date (datetime.date, optional): Global start date for signup date range.
         global_end_date (datetime.date, optional): Global end date for signup date range.
+        rng (np.random.Generator, optional): Random generator used for all draws.
 
     Returns:
         list: List of guest customer dicts with full attributes.
     """
+    if rng is None:
+        rng = np.random.default_rng()
 
     if faker is None:
         try:
@@ -214,24 +288,13 @@ def generate_guest_customers(num_guest_customers, faker=None, config=None, start
 
     # The 'config' parameter is now the main Config object.
     # Get parameters directly from the config object.
-    guest_contact_pool_size = get_param(config, 'guest_contact_pool_size', 50)
-    guest_contact_reuse_prob = get_param(config, 'guest_contact_reuse_prob', 0.2)
-
-    # These vocabs are loaded but not used for guests, but we keep the logic for consistency
-    # in case guest generation is enhanced later.
-    genders = get_vocab(config, 'genders', ['Male', 'Female', 'Other', 'Prefer not to say'])
-    loyalty_tiers = get_vocab(config, 'loyalty_tiers', ['Bronze', 'Silver', 'Gold', 'Platinum'])
-    signup_channel_options = get_vocab(config, 'signup_channels', ['Website', 'Phone'])
-    clv_map = config.raw_config.get('clv_map', {
-        'Bronze': 'Low',
-        'Silver': 'Medium',
-        'Gold': 'High',
-        'Platinum': 'High'
-    })
+    parameters = config.parameters
+    guest_contact_pool_size = parameters.get('guest_contact_pool_size', 50)
+    guest_contact_reuse_prob = parameters.get('guest_contact_reuse_prob', 0.2)
 
     customer_status = 'Guest'
 
-    guest_customers = []
+    guest_customers = [None] * num_guest_customers
     # guest_incomplete_data_prob = get_param(merged_config, 'guest_incomplete_data_prob', 0.3)
 
     global _recurrent_guest_contact_pool
@@ -245,9 +308,20 @@ def generate_guest_customers(num_guest_customers, faker=None, config=None, start
             })
             _recurrent_guest_contact_pool[-1]['billing_address'] = _recurrent_guest_contact_pool[-1]['mailing_address']
 
+    guest_customer_ids = np.char.mod('GUEST-%05d', np.arange(start_guest_id, start_guest_id + num_guest_customers)).tolist()
+
+    # Decide up front which guests reuse pooled contact info, so the fresh emails and addresses
+    # can be drawn from Faker in one batch instead of inside the loop.
+    reuse_draws = (rng.random(num_guest_customers) < guest_contact_reuse_prob).tolist()
+    if not _recurrent_guest_contact_pool:
+        reuse_draws = [False] * num_guest_customers
+    reuse_pick_draws = rng.random(num_guest_customers).tolist()
+    num_fresh_contacts = num_guest_customers - sum(reuse_draws)
+    fresh_contacts = [(faker.email(), generate_address(faker)) for _ in range(num_fresh_contacts)]
+    fresh_contact_idx = 0
+
     for i in range(num_guest_customers):
-        customer_id_num = start_guest_id + i
-        customer_id = f"GUEST-{customer_id_num:05d}"
+        customer_id = guest_customer_ids[i]
 
         # Randomly assign age, gender, loyalty, signup_date for guests to have full baseline
         age = None
@@ -258,17 +332,14 @@ def generate_guest_customers(num_guest_customers, faker=None, config=None, start
         signup_channel = None
         clv_bucket = None
 
-        reused_contact_info = None
-        if _recurrent_guest_contact_pool and random.random() < guest_contact_reuse_prob:
-            reused_contact_info = random.choice(_recurrent_guest_contact_pool)
-
-        if reused_contact_info:
+        if reuse_draws[i]:
+            reused_contact_info = _recurrent_guest_contact_pool[int(reuse_pick_draws[i] * len(_recurrent_guest_contact_pool))]
             email = reused_contact_info['email']
             mailing_address = reused_contact_info['mailing_address']
             billing_address = reused_contact_info['billing_address']
         else:
-            email = faker.email()
-            mailing_address = generate_address(faker)
+            email, mailing_address = fresh_contacts[fresh_contact_idx]
+            fresh_contact_idx += 1
             billing_address = mailing_address
             new_contact = {
                 'email': email,
@@ -303,7 +374,7 @@ def generate_guest_customers(num_guest_customers, faker=None, config=None, start
             'clv_bucket': clv_bucket,
             'is_guest': True,
         }
-        guest_customers.append(customer)
+        guest_customers[i] = customer
 
     # Removed block that attempted to call .isoformat() on 'signup_date' for guests,
     # since it is always None for guest customers.
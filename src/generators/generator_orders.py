@@ -5,33 +5,115 @@ Includes logic for dynamic tier evolution.
 """
 
 import random
+from collections import defaultdict
+import numpy as np
 from typing import List, Dict, Any
-import pandas as pd
 from datetime import datetime
 from faker import Faker
-from .generator_common_utils import get_param, get_vocab, assign_agent
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the earned-status kernel runs as plain Python without it
+    njit = None
+from .generator_common_utils import get_param, get_vocab, get_agent_ids, generate_unique_ids, get_rng
+
+def _weighted_draws(weights: List[float], size: int, rng: np.random.Generator) -> List[int]:
+    """Draws `size` indices into `weights` in one batch, each with probability proportional to its weight."""
+    cumulative = np.cumsum(weights, dtype=float)
+    indices = np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side='right')
+    return np.minimum(indices, len(weights) - 1).tolist()
+
+def _evolve_earned_indices(customer_idx, cart_totals, tier_thresholds, clv_thresholds,
+                           spend, tier_idx, clv_idx, tier_out, clv_out):
+    """
+    Walks orders in date order, accumulating each customer's spend and writing the index of the
+    highest tier and CLV threshold it meets (-1 for none) into `tier_out` and `clv_out`.
 
-def generate_order_id(faker_instance: Faker) -> str:
-    """Generate a unique order ID."""
-    return faker_instance.unique.bothify(text="ORD-########")
+    `spend`, `tier_idx` and `clv_idx` hold per-customer state. Spend never falls, so a customer's
+    indices only advance past thresholds crossed since their last order. The same source runs
+    compiled over numpy arrays when numba is installed, or over plain lists otherwise.
+    """
+    num_tiers = len(tier_thresholds)
+    num_clv_buckets = len(clv_thresholds)
+    for i in range(len(customer_idx)):
+        c = customer_idx[i]
+        new_spend = spend[c] + cart_totals[i]
+        spend[c] = new_spend
+        t = tier_idx[c]
+        while t + 1 < num_tiers and new_spend >= tier_thresholds[t + 1]:
+            t += 1
+        tier_idx[c] = t
+        tier_out[i] = t
+        b = clv_idx[c]
+        while b + 1 < num_clv_buckets and new_spend >= clv_thresholds[b + 1]:
+            b += 1
+        clv_idx[c] = b
+        clv_out[i] = b
+
+_evolve_earned_indices_jit = njit(cache=True)(_evolve_earned_indices) if njit is not None else None
+
+def _earned_indices(customer_idx: List[int], cart_totals: List[float], tier_thresholds: List[float],
+                    clv_thresholds: List[float], num_customers: int) -> (List[int], List[int]):
+    """Returns each order's earned tier and CLV index, using the numba kernel when it is available."""
+    num_orders = len(customer_idx)
+    if _evolve_earned_indices_jit is not None and num_orders:
+        tier_out = np.empty(num_orders, dtype=np.int64)
+        clv_out = np.empty(num_orders, dtype=np.int64)
+        _evolve_earned_indices_jit(
+            np.asarray(customer_idx, dtype=np.int64), np.asarray(cart_totals, dtype=np.float64),
+            np.asarray(tier_thresholds, dtype=np.float64), np.asarray(clv_thresholds, dtype=np.float64),
+            np.zeros(num_customers), np.full(num_customers, -1, dtype=np.int64),
+            np.full(num_customers, -1, dtype=np.int64), tier_out, clv_out,
+        )
+        return tier_out.tolist(), clv_out.tolist()
+    tier_out = [-1] * num_orders
+    clv_out = [-1] * num_orders
+    _evolve_earned_indices(
+        customer_idx, cart_totals, tier_thresholds, clv_thresholds,
+        [0] * num_customers, [-1] * num_customers, [-1] * num_customers, tier_out, clv_out,
+    )
+    return tier_out, clv_out
 
 def generate_orders(columns: List[str], num_rows: int, faker_instance: Faker, lookup_cache: Dict, config: Any) -> List[Dict[str, Any]]:
     """
-    Generates order header records from converted shopping carts.
+    Generates order header records from converted shopping carts, building each order's items in the same pass.
 
     This function models a customer's "earned" status by calculating their loyalty tier
     and CLV bucket based on their cumulative spend *at the time of each order*.
     This creates a realistic, evolving snapshot of customer value.
+
+    For every order it also:
+    1. Transfers the items from the converted shopping cart to become order items.
+    2. Applies random discounts to line items based on configured probabilities.
+    3. Aggregates any duplicate product lines within the same order (e.g., summing quantities).
+    4. Sets the final `net_total`, `total_discount_amount`, and `payment_processing_fee`.
+    The order items are left in the lookup cache for `generate_order_items` to hand back.
     """
     converted_carts = lookup_cache.get("converted_carts", [])
-    customers_by_id = {c['customer_id']: c for c in lookup_cache.get('customers', [])}
+    # Orders are built in created_at order; the conversion step flags carts it already emitted that way.
+    if not lookup_cache.get("converted_carts_sorted"):
+        converted_carts = sorted(converted_carts, key=lambda x: x['created_at'])
+    products_by_id = {p['product_id']: p for p in lookup_cache.get('product_catalog', [])}
+    items_by_cart = defaultdict(list)
+    for item in lookup_cache.get("cart_items", []):
+        items_by_cart[item['cart_id']].append(item)
+    # Customer fields the orders copy, laid out as parallel lists indexed by customer position.
+    customers = lookup_cache.get('customers', [])
+    customer_index_by_id = {c['customer_id']: idx for idx, c in enumerate(customers)}
+    customer_emails = [c['email'] for c in customers]
+    customer_mailing_addresses = [c['mailing_address'] for c in customers]
+    customer_billing_addresses = [c['billing_address'] for c in customers]
 
     # --- Get parameters for dynamic order generation ---
     # Tier and CLV thresholds
     tier_thresholds = config.get_parameter('tier_spend_thresholds', {'Bronze': 0})
     clv_thresholds = config.get_parameter('clv_spend_thresholds', {'Low': 0})
-    sorted_tiers = sorted(tier_thresholds.items(), key=lambda item: item[1], reverse=True)
-    sorted_clv = sorted(clv_thresholds.items(), key=lambda item: item[1], reverse=True)
+    # Keep thresholds in ascending order so a customer's earned index only ever moves forward.
+    asc_tiers = sorted(tier_thresholds.items(), key=lambda item: item[1])
+    tier_threshold_values = [threshold for _, threshold in asc_tiers]
+    tier_labels = [tier for tier, _ in asc_tiers]
+    asc_clv = sorted(clv_thresholds.items(), key=lambda item: item[1])
+    clv_threshold_values = [threshold for _, threshold in asc_clv]
+    clv_labels = [bucket for bucket, _ in asc_clv]
 
     # Channel and shipping distributions
     order_channel_dist = config.get_parameter('order_channel_distribution', {'Web': 1.0})
@@ -41,130 +123,108 @@ def generate_orders(columns: List[str], num_rows: int, faker_instance: Faker, lo
     financial_params = config.get_parameter('financials', {})
     global_payment_methods = config.get_parameter('global_payment_method_distribution', {'Credit Card': 1.0})
     expedited_pct = config.get_parameter('expedited_pct', 20) / 100.0
-
-    # Cache to track a customer's cumulative spend as it evolves
-    customer_cumulative_spend = {}
-
+    discount_settings = config.get_parameter('discount_settings', {})
+    discount_probability = discount_settings.get('probability', 0)
+    discount_range_pct = discount_settings.get('range_pct', [0, 0])
+    fee_rates = financial_params.get('payment_fee_rates', {})
+    rand_random, rand_uniform = random.random, random.uniform
+    rng = get_rng(lookup_cache)
+
+    # Resolve every config-derived distribution once instead of rebuilding it per order.
+    channels = list(order_channel_dist.keys())
+    channel_weights = list(order_channel_dist.values())
+    shipping_speeds = list(shipping_speed_dist.keys())
+    shipping_weights = list(shipping_speed_dist.values())
+    global_methods = list(global_payment_methods.keys())
+    global_method_weights = list(global_payment_methods.values())
+    payment_methods_by_channel = {
+        channel: rules.get('allowed_payment_methods')
+        for channel, rules in channel_rules.items()
+    }
+    shipping_business_costs = financial_params.get('shipping_business_costs', {})
+    base_costs = shipping_business_costs.get('base_costs', {})
+    cost_variance = shipping_business_costs.get('cost_variance_pct', [0.0, 0.0])
+
+    # Carts whose customer is unknown produce no order.
+    order_carts = []
+    order_customer_idx = []
+    for cart in converted_carts:
+        customer_idx = customer_index_by_id.get(cart["customer_id"])
+        if customer_idx is not None:
+            order_carts.append(cart)
+            order_customer_idx.append(customer_idx)
+
+    # Determine each order's earned tier and CLV bucket from the customer's cumulative spend at the
+    # time of the order: the highest threshold that the spend meets, or None if it meets none.
+    earned_tier_idx, earned_clv_idx = _earned_indices(
+        order_customer_idx, [cart["cart_total"] for cart in order_carts],
+        tier_threshold_values, clv_threshold_values, len(customers),
+    )
+
+    # Draw one unique ID per converted cart up front; carts without a customer leave theirs unused.
+    order_ids = generate_unique_ids("ORD-", len(converted_carts), rng=rng)
+
+    # Draw every per-order random choice in one batch, indexed by the order's position.
+    num_carts = len(converted_carts)
+    channel_draws = _weighted_draws(channel_weights, num_carts, rng)
+    shipping_draws = _weighted_draws(shipping_weights, num_carts, rng)
+    # One uniform per order picks the payment method: scaled into the channel's allowed list,
+    # or mapped through the global distribution when the channel has no rule.
+    payment_draws = rng.random(num_carts)
+    global_cumulative = np.cumsum(global_method_weights, dtype=float)
+    global_method_draws = np.minimum(
+        np.searchsorted(global_cumulative, payment_draws * global_cumulative[-1], side='right'),
+        len(global_methods) - 1,
+    ).tolist()
+    payment_draws = payment_draws.tolist()
+    variance_draws = rng.uniform(cost_variance[0], cost_variance[1], num_carts).tolist()
+    expedited_draws = (rng.random(num_carts) < expedited_pct).tolist()
+    agent_draws = rng.random(num_carts).tolist()
+    # Phone orders pick from the configured agent pool, resolved on the first Phone order.
+    agent_ids = None
+
+    # Order items keyed by (order_id, product_id). A cart can have the same product added twice,
+    # so duplicate lines are merged on insert to keep the composite primary key valid.
+    order_items_by_key = {}
     orders = []
-    for cart in sorted(converted_carts, key=lambda x: x['created_at']):
+    for order_idx, (cart, customer_idx) in enumerate(zip(order_carts, order_customer_idx)):
         customer_id = cart["customer_id"]
-        customer = customers_by_id.get(customer_id)
-        if not customer:
-            continue
-
-        # Update cumulative spend for this customer
-        previous_spend = customer_cumulative_spend.get(customer_id, 0)
-        new_spend = previous_spend + cart["cart_total"]
-        customer_cumulative_spend[customer_id] = new_spend
-
-        # Determine the customer's earned tier and CLV bucket based on their new cumulative spend.
-        earned_tier = None
-        for tier, threshold in sorted_tiers:
-            if new_spend >= threshold:
-                earned_tier = tier
-                break
-        
-        earned_clv_bucket = None
-        for bucket, threshold in sorted_clv:
-            if new_spend >= threshold:
-                earned_clv_bucket = bucket
-                break
+        tier_idx = earned_tier_idx[order_idx]
+        earned_tier = tier_labels[tier_idx] if tier_idx >= 0 else None
+        clv_idx = earned_clv_idx[order_idx]
+        earned_clv_bucket = clv_labels[clv_idx] if clv_idx >= 0 else None
 
         # Assign order channel dynamically based on configured distribution
-        channels = list(order_channel_dist.keys())
-        weights = list(order_channel_dist.values())
-        order_channel = random.choices(channels, weights=weights, k=1)[0]
+        order_channel = channels[channel_draws[order_idx]]
 
         # Assign payment method based on channel rules
-        channel_specific_methods = channel_rules.get(order_channel, {}).get('allowed_payment_methods')
+        channel_specific_methods = payment_methods_by_channel.get(order_channel)
         if channel_specific_methods:
-            payment_method = random.choice(channel_specific_methods)
+            payment_method = channel_specific_methods[int(payment_draws[order_idx] * len(channel_specific_methods))]
         else:
             # Fallback to global distribution if no specific rule
-            payment_method = random.choices(list(global_payment_methods.keys()), weights=list(global_payment_methods.values()), k=1)[0]
+            payment_method = global_methods[global_method_draws[order_idx]]
 
         # Assign shipping speed and cost
-        shipping_speeds = list(shipping_speed_dist.keys())
-        shipping_weights = list(shipping_speed_dist.values())
-        shipping_speed = random.choices(shipping_speeds, weights=shipping_weights, k=1)[0]
+        shipping_speed = shipping_speeds[shipping_draws[order_idx]]
         shipping_cost = shipping_costs.get(shipping_speed, 5.0)
 
         # NEW: Calculate business-side financial data using the enriched model
-        shipping_business_costs = financial_params.get('shipping_business_costs', {})
-        base_costs = shipping_business_costs.get('base_costs', {})
-        cost_variance = shipping_business_costs.get('cost_variance_pct', [0.0, 0.0])
         base_shipping_cost = base_costs.get(shipping_speed, shipping_cost) # Fallback to customer price if not defined
-        variance_multiplier = 1.0 + random.uniform(cost_variance[0], cost_variance[1])
+        variance_multiplier = 1.0 + variance_draws[order_idx]
         actual_shipping_cost = round(base_shipping_cost * variance_multiplier, 2)
 
-        agent_id = assign_agent(order_channel, config)
-
-        order = {
-            "order_id": generate_order_id(faker_instance),
-            "total_items": 0, # Will be patched
-            "order_date": cart["created_at"],
-            "customer_id": customer_id,
-            "email": customer["email"],
-            "order_channel": order_channel,
-            "is_expedited": random.random() < expedited_pct,
-            "customer_tier": earned_tier,
-            "gross_total": cart["cart_total"], # This is the pre-discount total
-            "net_total": cart["cart_total"], # Will be patched after discounts are calculated
-            "total_discount_amount": 0.0, # Will be patched
-            "payment_method": payment_method,
-            "shipping_speed": shipping_speed,
-            "shipping_cost": shipping_cost,
-            "actual_shipping_cost": actual_shipping_cost,
-            "payment_processing_fee": 0.0, # Will be patched after net_total is known
-            "agent_id": agent_id,
-            "shipping_address": customer["mailing_address"],
-            "billing_address": customer["billing_address"],
-            "clv_bucket": earned_clv_bucket,
-            "is_reactivated": cart.get("is_reactivation_cart", False)
-        }
-        orders.append(order)
-
-    return orders
-
-def generate_order_items(columns: List[str], num_rows: int, faker_instance: Faker, lookup_cache: Dict, config: Any) -> (List[Dict[str, Any]], Dict[str, Dict[str, Any]]):
-    """
-    Generates order items from converted carts, applies discounts, and calculates final order totals.
-
-    This function performs several key steps:
-    1. Transfers items from "converted" shopping carts to become order items.
-    2. Applies random discounts to line items based on configured probabilities.
-    3. Aggregates any duplicate product lines within the same order (e.g., summing quantities).
-    4. Calculates the final `net_total`, `total_discount_amount`, and `payment_processing_fee`.
-    5. Returns both the clean list of order items and a dictionary of updates to be patched back to the `orders` table.
-    """
-    converted_carts = lookup_cache.get("converted_carts", [])
-    cart_items = lookup_cache.get("cart_items", [])
-    orders = lookup_cache.get("orders", [])
-    products_by_id = {p['product_id']: p for p in lookup_cache.get('product_catalog', [])}
-    discount_settings = config.get_parameter('discount_settings', {})
-    financial_params = config.get_parameter('financials', {})
-
-    if not converted_carts or not cart_items or not orders:
-        return [], {}
-
-    # Create mappings for quick lookup
-    cart_id_to_order_id = {cart['cart_id']: order['order_id'] for cart, order in zip(sorted(converted_carts, key=lambda x: x['created_at']), orders)}
-    cart_id_to_gross_total = {cart['cart_id']: cart['cart_total'] for cart in converted_carts}
-    
-    all_order_items = []
-    order_updates = {}
-
-    # Group cart items by cart_id
-    items_by_cart = {}
-    for item in cart_items:
-        cart_id = item['cart_id']
-        if cart_id not in items_by_cart:
-            items_by_cart[cart_id] = []
-        items_by_cart[cart_id].append(item)
+        if order_channel == "Phone":
+            if agent_ids is None:
+                agent_ids = get_agent_ids(config)
+            agent_id = agent_ids[int(agent_draws[order_idx] * len(agent_ids))]
+        else:
+            agent_id = "ONLINE"
 
-    for cart_id, order_id in cart_id_to_order_id.items():
-        items_in_cart = items_by_cart.get(cart_id, [])
-        total_discount_for_order = 0.0
+        order_id = order_ids[order_idx]
+        items_in_cart = items_by_cart.get(cart["cart_id"], [])
+        # Discounts are summed in integer cents so order totals carry no float drift.
+        total_discount_cents = 0
 
         for item in items_in_cart:
             product = products_by_id.get(item['product_id'])
@@ -172,50 +232,73 @@ def generate_order_items(columns: List[str], num_rows: int, faker_instance: Fake
                 continue # Skip if product not found, though this indicates an issue
 
             # NEW: Apply discounts
-            discount_amount = 0.0
-            if random.random() < discount_settings.get('probability', 0):
-                discount_pct = random.uniform(*discount_settings.get('range_pct', [0, 0]))
+            discount_cents = 0
+            if rand_random() < discount_probability:
+                discount_pct = rand_uniform(*discount_range_pct)
                 # Discount is applied to the line item total (unit_price * quantity)
                 line_item_total = item['unit_price'] * item['quantity']
-                discount_amount = round(line_item_total * discount_pct, 2)
-
-            order_item = item.copy()
-            order_item.pop('cart_item_id', None)
-            order_item.pop('cart_id', None)
-            order_item['order_id'] = order_id
-            order_item['discount_amount'] = discount_amount
-            order_item['cost_price'] = product['cost_price']
-            all_order_items.append(order_item)
-
-            total_discount_for_order += discount_amount
+                discount_cents = round(line_item_total * discount_pct * 100)
+            discount_amount = discount_cents / 100
+
+            item_key = (order_id, item['product_id'])
+            existing_item = order_items_by_key.get(item_key)
+            if existing_item is not None:
+                existing_item['quantity'] += item['quantity']
+                existing_item['discount_amount'] = round(existing_item['discount_amount'] + discount_amount, 2)
+            else:
+                order_items_by_key[item_key] = {
+                    "order_id": order_id,
+                    "product_id": item['product_id'],
+                    "product_name": item['product_name'],
+                    "category": item['category'],
+                    "quantity": item['quantity'],
+                    "unit_price": item['unit_price'],
+                    "discount_amount": discount_amount,
+                    "cost_price": product['cost_price'],
+                }
+
+            total_discount_cents += discount_cents
 
         # Use the definitive gross_total from the cart to avoid floating point discrepancies.
-        gross_total_for_order = cart_id_to_gross_total.get(cart_id, 0.0)
-        net_total_for_order = round(gross_total_for_order - total_discount_for_order, 2)
+        net_total_for_order = (round(cart["cart_total"] * 100) - total_discount_cents) / 100
 
         # NEW: Calculate payment processing fee based on the final net_total
-        order_record = next((o for o in orders if o['order_id'] == order_id), None)
-        payment_method = order_record.get('payment_method') if order_record else 'Credit Card'
-        fee_rates = financial_params.get('payment_fee_rates', {})
         payment_fee_rate = fee_rates.get(payment_method, 0.0)
         payment_processing_fee = round(net_total_for_order * payment_fee_rate, 2)
 
-        order_updates[order_id] = {
+        order = {
+            "order_id": order_id,
             "total_items": len(items_in_cart),
+            "order_date": cart["created_at"],
+            "customer_id": customer_id,
+            "email": customer_emails[customer_idx],
+            "order_channel": order_channel,
+            "is_expedited": expedited_draws[order_idx],
+            "customer_tier": earned_tier,
+            "gross_total": cart["cart_total"], # This is the pre-discount total
             "net_total": net_total_for_order,
-            "total_discount_amount": round(total_discount_for_order, 2),
-            "payment_processing_fee": payment_processing_fee
+            "total_discount_amount": total_discount_cents / 100,
+            "payment_method": payment_method,
+            "shipping_speed": shipping_speed,
+            "shipping_cost": shipping_cost,
+            "actual_shipping_cost": actual_shipping_cost,
+            "payment_processing_fee": payment_processing_fee,
+            "agent_id": agent_id,
+            "shipping_address": customer_mailing_addresses[customer_idx],
+            "billing_address": customer_billing_addresses[customer_idx],
+            "clv_bucket": earned_clv_bucket,
+            "is_reactivated": cart.get("is_reactivation_cart", False)
         }
+        orders.append(order)
 
-    # De-duplicate items before returning: a cart can have the same product added twice.
-    # This ensures the final order_items table has a valid composite primary key.
-    if not all_order_items:
-        return [], {}
+    lookup_cache["generated_order_items"] = list(order_items_by_key.values())
+    return orders
 
-    order_items_df = pd.DataFrame(all_order_items)
-    agg_funcs = {col: 'first' for col in order_items_df.columns if col not in ['order_id', 'product_id', 'quantity', 'discount_amount']}
-    agg_funcs['quantity'] = 'sum'
-    agg_funcs['discount_amount'] = 'sum'
-    deduped_df = order_items_df.groupby(['order_id', 'product_id'], as_index=False).agg(agg_funcs)
+def generate_order_items(columns: List[str], num_rows: int, faker_instance: Faker, lookup_cache: Dict, config: Any) -> (List[Dict[str, Any]], Dict[str, Dict[str, Any]]):
+    """
+    Returns the order items that `generate_orders` built alongside the orders.
 
-    return deduped_df.to_dict(orient='records'), order_updates
\ No newline at end of file
+    Discounts, duplicate-line merging and the order totals are all settled while the orders are
+    generated, so there are no order updates left to patch and the update dict is always empty.
+    """
+    return lookup_cache.pop("generated_order_items", []), {}
@@ -5,20 +5,21 @@ for multi-item and partial returns.
 """
 
 import random
+from collections import defaultdict
+from operator import itemgetter
+import numpy as np
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from faker import Faker
-from .generator_common_utils import get_param, get_vocab
+from .generator_common_utils import get_param, get_vocab, get_customers_by_id, generate_unique_ids, get_rng
 from utils.date_utils import safe_date_between
 
-def generate_return_id(faker_instance: Faker) -> str:
-    """Generate a unique return ID."""
-    return faker_instance.unique.bothify(text="RTN-########")
+# Fields copied from an order item onto each of its return items, read in one call.
+_order_item_fields = itemgetter("product_id", "product_name", "category", "quantity", "unit_price", "cost_price")
+
+def _generate_single_return(order, order_date, return_reasons, global_end_date, timing_dist, after_date=None):
+    """Helper to generate a single return record for a given order, whose date is already parsed."""
 
-def _generate_single_return(order, faker_instance, config, global_end_date, timing_dist, after_date=None):
-    """Helper to generate a single return record for a given order."""
-    order_date = datetime.fromisoformat(order["order_date"]).date()
-    
     # Determine return date based on timing distribution
     rand_val = random.random()
     min_delay = 1
@@ -32,16 +33,14 @@ def _generate_single_return(order, faker_instance, config, global_end_date, timi
     # If this is a second return, ensure it happens after the first
     start_return_date = order_date
     if after_date:
-        first_return_date = datetime.fromisoformat(after_date).date()
-        start_return_date = max(order_date, first_return_date + timedelta(days=1))
+        start_return_date = max(order_date, after_date + timedelta(days=1))
 
     potential_return_date = start_return_date + timedelta(days=random.randint(min_delay, max_delay))
     if potential_return_date > global_end_date:
         return None # Return would happen outside the simulation window
 
-    return_reasons = get_vocab(config, 'return_reasons', ['Defective'])
     return {
-        "return_id": generate_return_id(faker_instance),
+        "return_id": None, # Assigned once all returns are generated
         "order_id": order["order_id"],
         "customer_id": order["customer_id"],
         "email": order["email"],
@@ -61,30 +60,43 @@ def generate_returns(columns: List[str], num_rows: int, faker_instance: Faker, l
     orders = lookup_cache.get("orders")
     if not orders:
         return []
-    customers_by_id = {c['customer_id']: c for c in lookup_cache.get('customers', [])}
+    customers_by_id = get_customers_by_id(lookup_cache)
 
     # NEW: Use channel-specific return rates, with a global fallback
     return_rate_config = config.get_parameter("return_rate_by_signup_channel", {})
     default_return_rate = config.get_parameter("return_rate", 0.25)
     multi_return_prob = config.get_parameter("multi_return_probability", 0.1)
     timing_dist = config.get_parameter("return_timing_distribution", [[30, 1.0]])
+    return_reasons = get_vocab(config, 'return_reasons', ['Defective'])
 
-    returns = []
+    # Use channel-specific return rate, or fallback to global rate
+    return_rates = []
     for order in orders:
         customer = customers_by_id.get(order['customer_id'])
         signup_channel = customer.get('signup_channel') if customer else 'default'
+        return_rates.append(return_rate_config.get(signup_channel, default_return_rate))
 
-        # Use channel-specific return rate, or fallback to global rate
-        effective_return_rate = return_rate_config.get(signup_channel, default_return_rate)
-
-        if random.random() < effective_return_rate:
-            first_return = _generate_single_return(order, faker_instance, config, global_end_date, timing_dist)
-            if first_return:
-                returns.append(first_return)
-                if random.random() < multi_return_prob:
-                    second_return = _generate_single_return(order, faker_instance, config, global_end_date, timing_dist, after_date=first_return['return_date'])
-                    if second_return:
-                        returns.append(second_return)
+    # Decide which orders get a return in one vectorized draw
+    rng = get_rng(lookup_cache)
+    returning_order_idx = np.flatnonzero(rng.random(len(orders)) < np.asarray(return_rates, dtype=float))
+
+    rand_random = random.random
+    returns = []
+    for idx in returning_order_idx.tolist():
+        order = orders[idx]
+        # Parse the order date once; both return events for the order start from it.
+        order_date = datetime.fromisoformat(order["order_date"]).date()
+        first_return = _generate_single_return(order, order_date, return_reasons, global_end_date, timing_dist)
+        if first_return:
+            returns.append(first_return)
+            if rand_random() < multi_return_prob:
+                second_return = _generate_single_return(order, order_date, return_reasons, global_end_date, timing_dist, after_date=date.fromisoformat(first_return['return_date']))
+                if second_return:
+                    returns.append(second_return)
+
+    # Draw exactly one unique ID per return produced.
+    for ret, return_id in zip(returns, generate_unique_ids("RTN-", len(returns), rng=rng)):
+        ret["return_id"] = return_id
     return returns
 
 def generate_return_items(columns: List[str], num_rows: int, faker_instance: Faker, lookup_cache: Dict, config: Any) -> (List[Dict[str, Any]], Dict[str, float]):
@@ -100,23 +112,31 @@ def generate_return_items(columns: List[str], num_rows: int, faker_instance: Fak
         raise ValueError("Order items must be generated before return items.")
 
     # Group order items by order_id for efficient lookup
-    order_items_by_order = {}
+    order_items_by_order = defaultdict(list)
     for item in order_items:
-        order_id = item["order_id"]
-        if order_id not in order_items_by_order:
-            order_items_by_order[order_id] = []
-        order_items_by_order[order_id].append(item)
+        order_items_by_order[item["order_id"]].append(item)
 
     # NEW: Get reason-driven refund behavior from config
     refund_behavior_by_reason = config.get_parameter('refund_behavior_by_reason', {})
     default_refund_behavior = refund_behavior_by_reason.get('default', {'full_return_prob': 0.5, 'partial_quantity_prob': 0.4})
+    # Resolve each reason's (full_return_prob, partial_quantity_prob) pair once instead of per return.
+    refund_probs_by_reason = {
+        reason: (behavior.get('full_return_prob', 0.5), behavior.get('partial_quantity_prob', 0.4))
+        for reason, behavior in refund_behavior_by_reason.items()
+    }
+    default_refund_probs = (
+        default_refund_behavior.get('full_return_prob', 0.5),
+        default_refund_behavior.get('partial_quantity_prob', 0.4),
+    )
 
     all_return_items = []
     return_updates = {}
     return_item_id_counter = 1
-    # Use a shared cache to track returned items across multiple return events for the same order.
+    # Use a shared cache to track returned products per order across multiple return events.
     # This prevents an item from being returned more than once.
-    returned_item_keys = lookup_cache.setdefault('returned_item_keys', set())
+    returned_products_by_order = lookup_cache.setdefault('returned_products_by_order', {})
+    # Bind the random helpers locally; they are called per return and per returned item.
+    rand_random, rand_randint, rand_sample = random.random, random.randint, random.sample
 
     for ret in returns:
         order_id = ret["order_id"]
@@ -125,56 +145,60 @@ def generate_return_items(columns: List[str], num_rows: int, faker_instance: Fak
             continue
         
         # Filter out items that have already been returned for this order
-        available_items_to_return = [
-            item for item in original_items 
-            if (order_id, item['product_id']) not in returned_item_keys
-        ]
+        already_returned = returned_products_by_order.get(order_id)
+        if already_returned:
+            available_items_to_return = [
+                item for item in original_items
+                if item['product_id'] not in already_returned
+            ]
+        else:
+            available_items_to_return = original_items
         if not available_items_to_return:
             continue # All items for this order have been returned in a previous event
 
         # NEW: Determine refund behavior based on the return reason
-        reason = ret.get('reason')
-        behavior = refund_behavior_by_reason.get(reason, default_refund_behavior)
-        full_return_prob = behavior.get('full_return_prob', 0.5)
-        partial_quantity_prob = behavior.get('partial_quantity_prob', 0.4)
+        full_return_prob, partial_quantity_prob = refund_probs_by_reason.get(ret.get('reason'), default_refund_probs)
 
         # Decide which items to return
-        if random.random() < full_return_prob:
+        if rand_random() < full_return_prob:
             items_to_return = available_items_to_return # Return all remaining items
         else:
             # Partial return: select a random subset of items
-            num_to_return = random.randint(1, len(available_items_to_return))
-            items_to_return = random.sample(available_items_to_return, num_to_return)
+            num_to_return = rand_randint(1, len(available_items_to_return))
+            items_to_return = rand_sample(available_items_to_return, num_to_return)
 
+        return_id = ret["return_id"]
+        returned_products = returned_products_by_order.setdefault(order_id, set())
         total_refunded_for_return = 0.0
         for item in items_to_return:
+            product_id, product_name, category, quantity, unit_price, cost_price = _order_item_fields(item)
             # NEW: Allow for partial quantity returns on multi-quantity line items
-            if item["quantity"] > 1 and random.random() < partial_quantity_prob:
+            if quantity > 1 and rand_random() < partial_quantity_prob:
                 # Return a random quantity less than the original
-                quantity_returned = random.randint(1, item["quantity"] - 1)
+                quantity_returned = rand_randint(1, quantity - 1)
             else:
-                quantity_returned = item["quantity"] # Return full quantity
-            refunded_amount = item["unit_price"] * quantity_returned
+                quantity_returned = quantity # Return full quantity
+            refunded_amount = unit_price * quantity_returned
 
             return_item = {
                 "return_item_id": return_item_id_counter,
-                "return_id": ret["return_id"],
+                "return_id": return_id,
                 "order_id": order_id,
-                "product_id": item["product_id"],
-                "product_name": item["product_name"],
-                "category": item["category"],
+                "product_id": product_id,
+                "product_name": product_name,
+                "category": category,
                 "quantity_returned": quantity_returned,
-                "unit_price": item["unit_price"],
-                "cost_price": item["cost_price"],
+                "unit_price": unit_price,
+                "cost_price": cost_price,
                 "refunded_amount": round(refunded_amount, 2)
             }
             all_return_items.append(return_item)
             total_refunded_for_return += refunded_amount
             return_item_id_counter += 1
             # Mark this item as returned for this order
-            returned_item_keys.add((order_id, item['product_id']))
+            returned_products.add(product_id)
 
         # Prepare the update for the parent return record
-        return_updates[ret["return_id"]] = round(total_refunded_for_return, 2)
+        return_updates[return_id] = round(total_refunded_for_return, 2)
 
     return all_return_items, return_updates
\ No newline at end of file
@@ -2,46 +2,102 @@ import pandas as pd
 import numpy as np
 import os
 import argparse
-import random
+from concurrent.futures import ProcessPoolExecutor
 
 from utils.config import Config
 
-def inject_whitespace(df: pd.DataFrame, columns: list, prob: float):
+try:
+    import pyarrow  # noqa: F401
+    # Arrow-backed strings keep each column in contiguous buffers, so the .str kernels stay vectorized
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:  # pyarrow is optional; fall back to pandas' default string handling
+    STRING_DTYPE = str
+
+# Whitespace padding options, indexed by bulk integer draws
+PADDINGS = np.array([' ', '  '])
+
+def inject_whitespace(df: pd.DataFrame, columns: list, prob: float, rng: np.random.Generator = None):
     """Adds random leading/trailing whitespace to string columns."""
+    if rng is None:
+        rng = np.random.default_rng()
     for col in columns:
         if col in df.columns and pd.api.types.is_string_dtype(df[col]):
             # Filter to non-null strings to avoid errors
-            mask = df[col].notna() & (df[col].apply(lambda x: isinstance(x, str) and random.random() < prob))
-            df.loc[mask, col] = df.loc[mask, col].apply(lambda x: random.choice([' ', '  ']) + x.strip() + random.choice([' ', '  ']))
+            mask = df[col].notna().to_numpy() & (rng.random(len(df)) < prob)
+            targets = df.loc[mask, col]
+            # Pad each side with one or two spaces, drawn in bulk for all targeted rows
+            left = pd.Series(PADDINGS[rng.integers(0, 2, size=len(targets))], index=targets.index)
+            right = pd.Series(PADDINGS[rng.integers(0, 2, size=len(targets))], index=targets.index)
+            df.loc[mask, col] = left + targets.str.strip() + right
     return df
 
-def inject_casing_variations(df: pd.DataFrame, columns: list, prob: float):
+def inject_casing_variations(df: pd.DataFrame, columns: list, prob: float, rng: np.random.Generator = None):
     """Changes casing (upper/lower/title) for string columns."""
+    if rng is None:
+        rng = np.random.default_rng()
     for col in columns:
         if col in df.columns and pd.api.types.is_string_dtype(df[col]):
-            mask = df[col].notna() & (df[col].apply(lambda x: isinstance(x, str) and random.random() < prob))
-            df.loc[mask, col] = df.loc[mask, col].apply(lambda x: random.choice([x.upper(), x.lower(), x.title()]))
+            mask = df[col].notna().to_numpy() & (rng.random(len(df)) < prob)
+            targets = df.loc[mask, col]
+            # Pick upper (0), lower (1) or title (2) casing for each targeted row
+            casing = rng.integers(0, 3, size=len(targets))
+            # Apply each casing only to the rows that drew it
+            varied = targets.copy()
+            varied[casing == 0] = targets[casing == 0].str.upper()
+            varied[casing == 1] = targets[casing == 1].str.lower()
+            varied[casing == 2] = targets[casing == 2].str.title()
+            df.loc[mask, col] = varied
     return df
 
-def inject_random_nulls(df: pd.DataFrame, columns: list, prob: float):
+def inject_random_nulls(df: pd.DataFrame, columns: list, prob: float, rng: np.random.Generator = None):
     """Randomly replaces non-null values with NaN in specified columns."""
+    if rng is None:
+        rng = np.random.default_rng()
     for col in columns:
         if col in df.columns:
             # If the column is boolean, convert it to object to allow for NaNs
             if pd.api.types.is_bool_dtype(df[col]):
                 df[col] = df[col].astype(object)
             # Only target non-nulls for injection
-            mask = df[col].notna() & (df[col].apply(lambda x: random.random() < prob))
+            mask = df[col].notna().to_numpy() & (rng.random(len(df)) < prob)
             df.loc[mask, col] = np.nan
     return df
 
-def run_injection(data_dir: str, messiness_level: str, config_path: str = None):
+def _inject_file(data_dir, filename, stylistic_cols, null_cols, probs, intensity, config, seed):
+    """Reads one CSV, applies every injection that targets it, and writes it back in place."""
+    filepath = os.path.join(data_dir, filename)
+    # Each file gets its own generator, so results do not depend on which worker runs first
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(filepath, dtype=STRING_DTYPE) # Read as string to prevent type inference issues
+
+    # Apply stylistic messiness (whitespace, casing)
+    if stylistic_cols:
+        df = inject_whitespace(df, stylistic_cols, probs.get("whitespace_prob", 0), rng)
+        df = inject_casing_variations(df, stylistic_cols, probs.get("casing_prob", 0), rng)
+        print(f"  Applied stylistic mess to {filename}")
+
+    # Apply random null injection
+    if null_cols:
+        df = inject_random_nulls(df, null_cols, probs.get("null_prob", 0), rng)
+        print(f"  Applied random null mess to {filename}")
+
+    if intensity:
+        if filename == "orders.csv":
+            df = inject_sales_spikes(df, intensity=intensity, config=config, rng=rng)
+        elif filename == "returns.csv":
+            df = inject_return_reason_bias(df, intensity=intensity, config=config, data_dir=data_dir, rng=rng)
+        print(f"  Applied advanced injection to {filename} with '{intensity}' intensity.")
+
+    df.to_csv(filepath, index=False)
+
+def run_injection(data_dir: str, messiness_level: str, config_path: str = None, seed: int = None, max_workers: int = None, config: Config = None):
     if messiness_level == "baseline":
         print("Skipping messiness injection as level is 'baseline'.")
         return
 
-    # Load config for advanced injections
-    config = Config(yaml_path=config_path) if config_path else None
+    # Load config for advanced injections, unless the caller already has it loaded
+    if config is None and config_path:
+        config = Config(yaml_path=config_path)
 
     print(f"Applying '{messiness_level}' messiness injection to data in: {data_dir}")
 
@@ -92,87 +148,100 @@ def run_injection(data_dir: str, messiness_level: str, config_path: str = None):
     }
     current_probs = messiness_probs.get(messiness_level, {})
 
-    # Apply stylistic messiness (whitespace, casing)
-    for filename, cols in string_cols_for_stylistic_mess.items():
-        filepath = os.path.join(data_dir, filename)
-        if os.path.exists(filepath):
-            df = pd.read_csv(filepath, dtype=str) # Read as string to prevent type inference issues
-            df = inject_whitespace(df.copy(), cols, current_probs.get("whitespace_prob", 0))
-            df = inject_casing_variations(df.copy(), cols, current_probs.get("casing_prob", 0))
-            df.to_csv(filepath, index=False)
-            print(f"  Applied stylistic mess to {filename}")
-        else:
-            print(f"  Warning: {filename} not found for stylistic mess injection.")
-
-    # Apply random null injection
-    for filename, cols in null_inject_cols.items():
-        filepath = os.path.join(data_dir, filename)
-        if os.path.exists(filepath):
-            df = pd.read_csv(filepath) # Read again, or pass the DataFrame if it was modified above
-            df = inject_random_nulls(df.copy(), cols, current_probs.get("null_prob", 0))
-            df.to_csv(filepath, index=False)
-            print(f"  Applied random null mess to {filename}")
-        else:
-            print(f"  Warning: {filename} not found for random null injection.")
+    # --- Advanced Injection (only applies to orders and returns) ---
+    intensity_map = {
+        "medium_mess": "medium",
+        "heavy_mess": "high"  # Map heavy_mess to 'high' intensity
+    }
+    intensity = intensity_map.get(messiness_level)
+    advanced_files = ["orders.csv", "returns.csv"] if intensity else []
 
+    # Read each file once, apply every injection that targets it, then write it back once.
+    # Each file gets its own child seed, so results don't depend on whether files run in parallel.
+    target_files = list(dict.fromkeys([*string_cols_for_stylistic_mess, *null_inject_cols, *advanced_files]))
+    # List the directory once instead of stat-ing each target file
+    present_files = {entry.name for entry in os.scandir(data_dir) if entry.is_file()} if os.path.isdir(data_dir) else set()
+    for filename in target_files:
+        if filename not in present_files:
+            print(f"  Warning: {filename} not found for messiness injection.")
+    target_files = [filename for filename in target_files if filename in present_files]
+    file_seeds = dict(zip(target_files, np.random.SeedSequence(seed).spawn(len(target_files))))
+    file_jobs = {
+        filename: (
+            data_dir, filename,
+            string_cols_for_stylistic_mess.get(filename), null_inject_cols.get(filename), current_probs,
+            intensity if filename in advanced_files else None, config, file_seeds[filename],
+        )
+        for filename in target_files
+    }
+    # Return reason bias reads order_items.csv, so returns.csv waits until the other files are written
+    deferred_files = ["returns.csv"] if intensity and "returns.csv" in file_jobs else []
+    waves = [wave for wave in ([f for f in target_files if f not in deferred_files], deferred_files) if wave]
 
-    # --- Advanced Injection (only applies to orders and returns) ---
-    if messiness_level in ["medium_mess", "heavy_mess"]:
-        intensity_map = {
-            "medium_mess": "medium",
-            "heavy_mess": "high"  # Map heavy_mess to 'high' intensity
-        }
-        intensity = intensity_map.get(messiness_level)
-
-        for filename in ["orders.csv", "returns.csv"]:
-            filepath = os.path.join(data_dir, filename)
-            if os.path.exists(filepath) and intensity:
-                df = pd.read_csv(filepath)
-                if filename == "orders.csv":
-                    df = inject_sales_spikes(df.copy(), intensity=intensity, config=config)
-                elif filename == "returns.csv":
-                    df = inject_return_reason_bias(df.copy(), intensity=intensity, config=config, data_dir=data_dir)
-                df.to_csv(filepath, index=False)
-                print(f"  Applied advanced injection to {filename} with '{intensity}' intensity.")
+    # Files are processed serially by default: a run touches a handful of small CSVs, where process
+    # startup and pickling outweigh the work, and serial runs keep the per-file log in order.
+    # Worker processes are used only when more than one is requested explicitly.
+    if not max_workers or max_workers <= 1:
+        for wave in waves:
+            for filename in wave:
+                _inject_file(*file_jobs[filename])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for wave in waves:
+                # list() waits for the whole wave and re-raises any worker error here
+                list(executor.map(_inject_file, *zip(*(file_jobs[f] for f in wave))))
 
     print("Messiness injection complete.")
 
 
-def inject_sales_spikes(df, intensity="low", config=None):
+def inject_sales_spikes(df, intensity="low", config=None, rng=None):
     """
     Injects sales spikes in 'total_items'.
     If a seasonal schema is in the config, it's used. Otherwise, a random month is spiked.
     """
+    if rng is None:
+        rng = np.random.default_rng()
     if "order_date" not in df.columns:
         return df
 
-    df['order_date'] = pd.to_datetime(df['order_date'])
+    # Parse the dates once and keep only the month; order_date itself is written back untouched.
+    # Timestamps mix whole and fractional seconds, so parse them as ISO 8601 rather than inferring a format.
+    months = pd.to_datetime(df['order_date'], format="ISO8601").dt.month.to_numpy()
+    # Files are read as strings, so make the item counts numeric before scaling them
+    total_items = pd.to_numeric(df["total_items"])
     seasonal_factors = config.get_parameter("seasonal_spike_factors", {}).get(intensity) if config else None
 
     if seasonal_factors:
         print(f"    Applying seasonal sales spikes for '{intensity}' level...")
+        orders_per_month = np.bincount(months, minlength=13)
+        # Build a month -> factor table (index 0 unused) so every order is scaled in one multiply
+        factor_by_month = np.ones(13)
         for month, factor in seasonal_factors.items():
-            mask = df['order_date'].dt.month == int(month)
-            affected_rows = mask.sum()
+            factor_by_month[int(month)] *= factor
+            affected_rows = orders_per_month[int(month)]
             if affected_rows > 0:
-                df.loc[mask, "total_items"] = (df.loc[mask, "total_items"] * factor).astype(int)
                 print(f"      - Spiked {affected_rows} orders in month {month} by {factor}x")
+        factors = factor_by_month[months]
     else:
         print("    Applying random monthly sales spike (fallback)...")
         spike_factor = {"low": 1.2, "medium": 1.5, "high": 2.0}.get(intensity, 1.2)
-        spike_month = random.choice(df["order_date"].dt.month.unique())
-        mask = df["order_date"].dt.month == spike_month
-        df.loc[mask, "total_items"] = (df.loc[mask, "total_items"] * spike_factor).astype(int)
+        spike_month = rng.choice(pd.unique(months))
+        mask = months == spike_month
+        factors = np.where(mask, spike_factor, 1.0)
         print(f"      - Spiked {mask.sum()} orders in month {spike_month} by {spike_factor}x")
 
+    # Truncate the scaled counts into nullable Int64 so counts blanked by the null-mess pass stay null
+    df["total_items"] = np.trunc(total_items * factors).astype("Int64")
     return df
 
 
-def inject_return_reason_bias(df, intensity="low", config=None, data_dir=None):
+def inject_return_reason_bias(df, intensity="low", config=None, data_dir=None, rng=None):
     """
     Overwrites a portion of return reasons using a contextual, weighted probability schema
     defined in the YAML config file. This makes the bias configurable and realistic.
     """
+    if rng is None:
+        rng = np.random.default_rng()
     if "reason" not in df.columns:
         return df
     if not config or not data_dir:
@@ -184,9 +253,10 @@ def inject_return_reason_bias(df, intensity="low", config=None, data_dir=None):
     if not os.path.exists(order_items_path):
         print("  Warning: order_items.csv not found. Cannot apply contextual return bias.")
         return df
-    order_items_df = pd.read_csv(order_items_path)
+    order_items_df = pd.read_csv(order_items_path, usecols=["order_id", "category"], dtype=STRING_DTYPE)
     # Create a lookup from order_id to the first category in that order.
-    order_to_category = order_items_df.drop_duplicates(subset=["order_id"]).set_index("order_id")["category"].str.lower().to_dict()
+    # Kept as a Series so the category lookup below is a single vectorized map rather than per-row dict gets.
+    order_to_category = order_items_df.drop_duplicates(subset=["order_id"]).set_index("order_id")["category"].str.lower()
 
     # Get schemas from config, now expected to be nested by category
     bias_schemas = config.get_parameter("return_reason_bias_schemas", {}).get(intensity, {})
@@ -194,29 +264,47 @@ def inject_return_reason_bias(df, intensity="low", config=None, data_dir=None):
         print(f"  Warning: No return reason bias schemas found for intensity '{intensity}'. Skipping.")
         return df
 
+    # Normalize each category's schema into (reasons, probs) once, up front
+    reason_probs_by_category = {}
+    for category, schema in bias_schemas.items():
+        if schema:
+            probs = np.fromiter(schema.values(), dtype=float)
+            reason_probs_by_category[category] = (list(schema.keys()), probs / probs.sum())
+    default_reason_probs = reason_probs_by_category.get("default")
+
     # Define what percentage of rows to overwrite based on intensity
     overwrite_prob = {"medium": 0.25, "high": 0.50}.get(intensity, 0.1)
 
-    mask = df["reason"].notna() & (np.random.rand(len(df)) < overwrite_prob)
+    mask = df["reason"].notna() & (rng.random(len(df)) < overwrite_prob)
     idx_to_modify = df[mask].index
 
     if len(idx_to_modify) > 0:
         final_reasons = df.loc[idx_to_modify, "reason"].copy()
+        # Orders without a known category fall back to the default schema
+        categories = df.loc[idx_to_modify, "order_id"].map(order_to_category).fillna("default")
         modified_count = 0
-        for idx in idx_to_modify:
-            order_id = df.loc[idx, "order_id"]
-            category = order_to_category.get(order_id)
-            schema = bias_schemas.get(category, bias_schemas.get("default"))
-            if schema:
-                reasons = list(schema.keys())
-                probs = np.array(list(schema.values()), dtype=float)
-                probs /= probs.sum()
-                final_reasons.loc[idx] = np.random.choice(reasons, p=probs)
-                modified_count += 1
+        # Draw replacement reasons for all selected rows of a category in one call
+        for category, group_idx in categories.groupby(categories).groups.items():
+            reason_probs = reason_probs_by_category.get(category, default_reason_probs)
+            if reason_probs:
+                reasons, probs = reason_probs
+                final_reasons.loc[group_idx] = rng.choice(reasons, size=len(group_idx), p=probs)
+                modified_count += len(group_idx)
         df.loc[idx_to_modify, "reason"] = final_reasons
         print(f"    Overwrote {modified_count} return reasons using '{intensity}' contextual schemas.")
 
     return df
 
+def main():
+    parser = argparse.ArgumentParser(description="Inject messiness into generated e-commerce CSVs.")
+    parser.add_argument("data_dir", help="Directory containing the generated CSV files")
+    parser.add_argument("--messiness-level", default="light_mess",
+                        choices=["baseline", "light_mess", "medium_mess", "heavy_mess"])
+    parser.add_argument("--config", default=None, help="YAML config used for advanced injections")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible injection")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes; files are processed serially unless this is above 1")
+    args = parser.parse_args()
+    run_injection(args.data_dir, args.messiness_level, config_path=args.config, seed=args.seed, max_workers=args.workers)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
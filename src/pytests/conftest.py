@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+from pathlib import Path
+from utils.config import Config
+
+CONFIG_PATH = "config/ecom_sales_gen_template.yaml"
+OUTPUT_DIR = Path("output")
+
+# --- Config Fixture ---
+# The template YAML is parsed once per session; tests must not mutate it.
+
+@pytest.fixture(scope="session")
+def cfg():
+    return Config(CONFIG_PATH)
+
+# --- Generated Table Fixtures ---
+# Each CSV is parsed once per test session and shared by every test that needs it.
+# Only the columns the data-quality tests check are parsed; add a column here before using it in a test.
+# Tests must treat these DataFrames as read-only.
+
+def _read_output(filename, columns):
+    return pd.read_csv(OUTPUT_DIR / filename, usecols=columns)
+
+@pytest.fixture(scope="session")
+def orders():
+    return _read_output("orders.csv", ["order_id", "customer_id", "order_date"])
+
+@pytest.fixture(scope="session")
+def customers():
+    return _read_output("customers.csv", ["customer_id", "signup_date"])
+
+@pytest.fixture(scope="session")
+def products():
+    return _read_output("product_catalog.csv", ["product_id"])
+
+@pytest.fixture(scope="session")
+def order_items():
+    return _read_output("order_items.csv", ["order_id", "product_id"])
+
+@pytest.fixture(scope="session")
+def returns():
+    return _read_output("returns.csv", ["return_id", "order_id", "return_date"])
+
+@pytest.fixture(scope="session")
+def return_items():
+    return _read_output("return_items.csv", ["return_id", "unit_price", "quantity_returned", "refunded_amount"])
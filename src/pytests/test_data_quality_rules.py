@@ -6,80 +6,66 @@ import pytest
 
 # --- Uniqueness Tests ---
 
-def test_orders_have_unique_ids():
-    df = pd.read_csv("output/orders.csv")
-    assert df["order_id"].is_unique, "Duplicate order_id values found in orders.csv"
+def test_orders_have_unique_ids(orders):
+    assert orders["order_id"].is_unique, "Duplicate order_id values found in orders.csv"
 
-def test_customers_have_unique_ids():
-    df = pd.read_csv("output/customers.csv")
-    assert df["customer_id"].is_unique, "Duplicate customer_id values found in customers.csv"
+def test_customers_have_unique_ids(customers):
+    assert customers["customer_id"].is_unique, "Duplicate customer_id values found in customers.csv"
 
-def test_products_have_unique_ids():
-    df = pd.read_csv("output/product_catalog.csv")
-    assert df["product_id"].is_unique, "Duplicate product_id values found in product_catalog.csv"
+def test_products_have_unique_ids(products):
+    assert products["product_id"].is_unique, "Duplicate product_id values found in product_catalog.csv"
 
 # --- Referential Integrity Tests ---
 
-def test_order_items_match_orders():
-    orders = pd.read_csv("output/orders.csv")
-    order_items = pd.read_csv("output/order_items.csv")
-    missing = order_items[~order_items["order_id"].isin(orders["order_id"])]
-    assert missing.empty, f"{len(missing)} order_items reference missing orders"
-
-def test_order_items_link_to_valid_products():
-    order_items = pd.read_csv("output/order_items.csv")
-    products = pd.read_csv("output/product_catalog.csv")
-    missing = order_items[~order_items["product_id"].isin(products["product_id"])]
-    assert missing.empty, f"{len(missing)} order_items reference missing products"
-
-def test_orders_link_to_valid_customers():
-    orders = pd.read_csv("output/orders.csv")
-    customers = pd.read_csv("output/customers.csv")
-    missing = orders[~orders["customer_id"].isin(customers["customer_id"])]
-    assert missing.empty, f"{len(missing)} orders reference missing customers"
-
-def test_return_items_match_returns():
-    returns = pd.read_csv("output/returns.csv")
-    return_items = pd.read_csv("output/return_items.csv")
-    missing = return_items[~return_items["return_id"].isin(returns["return_id"])]
-    assert missing.empty, f"{len(missing)} return_items reference missing returns"
-
-def test_returns_link_to_valid_orders():
-    returns = pd.read_csv("output/returns.csv")
-    orders = pd.read_csv("output/orders.csv")
-    missing = returns[~returns["order_id"].isin(orders["order_id"])]
-    assert missing.empty, f"{len(missing)} returns reference missing orders"
+def test_order_items_match_orders(orders, order_items):
+    missing_mask = ~order_items["order_id"].isin(set(orders["order_id"]))
+    assert not missing_mask.any(), f"{missing_mask.sum()} order_items reference missing orders"
+
+def test_order_items_link_to_valid_products(order_items, products):
+    missing_mask = ~order_items["product_id"].isin(set(products["product_id"]))
+    assert not missing_mask.any(), f"{missing_mask.sum()} order_items reference missing products"
+
+def test_orders_link_to_valid_customers(orders, customers):
+    missing_mask = ~orders["customer_id"].isin(set(customers["customer_id"]))
+    assert not missing_mask.any(), f"{missing_mask.sum()} orders reference missing customers"
+
+def test_return_items_match_returns(returns, return_items):
+    missing_mask = ~return_items["return_id"].isin(set(returns["return_id"]))
+    assert not missing_mask.any(), f"{missing_mask.sum()} return_items reference missing returns"
+
+def test_returns_link_to_valid_orders(returns, orders):
+    missing_mask = ~returns["order_id"].isin(set(orders["order_id"]))
+    assert not missing_mask.any(), f"{missing_mask.sum()} returns reference missing orders"
 
 # --- Logical Consistency Tests ---
 
-def test_refunded_amount_not_exceed_unit_price():
-    ri = pd.read_csv("output/return_items.csv")
+def test_refunded_amount_not_exceed_unit_price(return_items):
     # Round the calculated total to 2 decimal places to match the rounding
     # applied to refunded_amount during generation. This avoids floating point
     # precision issues where `round(x*y, 2)` can be slightly larger than the
     # raw float result of `x*y`.
-    calculated_total = (ri["unit_price"] * ri["quantity_returned"]).round(2)
-    overpaid = ri[ri["refunded_amount"] > calculated_total]
+    calculated_total = (return_items["unit_price"] * return_items["quantity_returned"]).round(2)
+    overpaid = return_items[return_items["refunded_amount"] > calculated_total]
     assert overpaid.empty, f"{len(overpaid)} return_items have excessive refunded amounts. Sample:\n{overpaid.head()}"
 
-def test_return_date_after_order_date():
-    returns = pd.read_csv("output/returns.csv")
-    orders = pd.read_csv("output/orders.csv")
-    merged = pd.merge(returns, orders[['order_id', 'order_date']], on='order_id', how='left')
-    # Drop rows where order_date might be missing due to a failed merge (already caught by other tests)
-    merged.dropna(subset=['order_date', 'return_date'], inplace=True)
+def test_return_date_after_order_date(returns, orders):
+    # Look up each return's order_date by key instead of merging the two tables.
+    # Duplicate parent rows (e.g. from mess injection) are dropped first so the lookup index is unique.
+    order_dates = orders.drop_duplicates('order_id').set_index('order_id')['order_date']
+    checked = returns.assign(order_date=returns['order_id'].map(order_dates))
+    # Drop rows where order_date is missing due to an unknown order_id (already caught by other tests)
+    checked = checked.dropna(subset=['order_date', 'return_date'])
     # Convert to datetime for comparison
-    merged['return_date_dt'] = pd.to_datetime(merged['return_date'])
-    merged['order_date_dt'] = pd.to_datetime(merged['order_date'])
-    invalid_dates = merged[merged['return_date_dt'] < merged['order_date_dt']]
+    return_date_dt = pd.to_datetime(checked['return_date'], format='ISO8601')
+    order_date_dt = pd.to_datetime(checked['order_date'], format='ISO8601')
+    invalid_dates = checked[return_date_dt < order_date_dt]
     assert invalid_dates.empty, f"{len(invalid_dates)} returns have a return_date before the order_date. Sample:\n{invalid_dates.head()}"
 
-def test_order_date_after_signup_date():
-    orders = pd.read_csv("output/orders.csv")
-    customers = pd.read_csv("output/customers.csv")
-    merged = pd.merge(orders, customers[['customer_id', 'signup_date']], on='customer_id', how='left')
-    merged.dropna(subset=['order_date', 'signup_date'], inplace=True)
-    merged['order_date_dt'] = pd.to_datetime(merged['order_date'])
-    merged['signup_date_dt'] = pd.to_datetime(merged['signup_date'])
-    invalid_dates = merged[merged['order_date_dt'] < merged['signup_date_dt']]
-    assert invalid_dates.empty, f"{len(invalid_dates)} orders occurred before the customer's signup_date. Sample:\n{invalid_dates.head()}"
\ No newline at end of file
+def test_order_date_after_signup_date(orders, customers):
+    signup_dates = customers.drop_duplicates('customer_id').set_index('customer_id')['signup_date']
+    checked = orders.assign(signup_date=orders['customer_id'].map(signup_dates))
+    checked = checked.dropna(subset=['order_date', 'signup_date'])
+    order_date_dt = pd.to_datetime(checked['order_date'], format='ISO8601')
+    signup_date_dt = pd.to_datetime(checked['signup_date'], format='ISO8601')
+    invalid_dates = checked[order_date_dt < signup_date_dt]
+    assert invalid_dates.empty, f"{len(invalid_dates)} orders occurred before the customer's signup_date. Sample:\n{invalid_dates.head()}"
@@ -2,14 +2,37 @@ import argparse
 import os
 import pandas as pd
 
+try:
+    import pyarrow  # noqa: F401
+    # pyarrow's multithreaded CSV reader is several times faster than the default C parser
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pyarrow is optional; fall back to pandas' C parser
+    CSV_ENGINE = "c"
+
+
+# Per-table read options: parse date columns and load low-cardinality labels as categories at
+# read time. Every column is still loaded because the schema section reports on all of them.
+READ_OPTIONS = {
+    "orders.csv": {
+        "parse_dates": ["order_date"],
+        "dtype": {"order_channel": "category", "agent_id": "category"},
+    },
+    "returns.csv": {
+        "parse_dates": ["return_date"],
+        "dtype": {"return_channel": "category", "agent_id": "category"},
+    },
+}
 
 def load_csv(name: str, data_dir: str) -> pd.DataFrame:
     """Read ``name`` from ``data_dir`` and return a DataFrame."""
-    return pd.read_csv(os.path.join(data_dir, name))
+    options = READ_OPTIONS.get(name, {})
+    # Generated timestamps mix whole and fractional seconds, so dates are parsed as ISO 8601
+    date_format = "ISO8601" if "parse_dates" in options else None
+    return pd.read_csv(os.path.join(data_dir, name), engine=CSV_ENGINE, date_format=date_format, **options)
 
 def run_big_audit(data_dir: str, messiness: str):
     """Runs a series of data integrity and business logic checks on the generated CSVs."""
-    # Load CSV files from the provided directory
+    # Load CSV files from the provided directory with the audit's own read options
     orders = load_csv("orders.csv", data_dir)
     order_items = load_csv("order_items.csv", data_dir)
     returns = load_csv("returns.csv", data_dir)
@@ -41,63 +64,61 @@ def run_big_audit(data_dir: str, messiness: str):
     # 2. Referential Integrity
     print("\nReferential Integrity Checks:")
 
+    # Parent key sets checked by the orphan counts below
+    customer_ids = pd.Index(customers['customer_id'])
+    order_ids = pd.Index(orders['order_id'])
+    return_ids = pd.Index(returns['return_id'])
+    product_ids = pd.Index(product_catalog['product_id'])
+
+    def count_invalid(child_keys: pd.Series, parent_ids: pd.Index) -> int:
+        # Count orphaned keys without materializing the offending rows
+        return int((~child_keys.isin(parent_ids)).sum())
+
     # orders.customer_id in customers.customer_id
-    invalid_cust_in_orders = orders[~orders['customer_id'].isin(customers['customer_id'])]
-    print(f"Orders with invalid customer_id count: {len(invalid_cust_in_orders)}")
+    print(f"Orders with invalid customer_id count: {count_invalid(orders['customer_id'], customer_ids)}")
 
     # order_items.order_id in orders.order_id
-    invalid_orderid_in_order_items = order_items[~order_items['order_id'].isin(orders['order_id'])]
-    print(f"Order items with invalid order_id count: {len(invalid_orderid_in_order_items)}")
+    print(f"Order items with invalid order_id count: {count_invalid(order_items['order_id'], order_ids)}")
 
     # returns.order_id in orders.order_id
-    invalid_orderid_in_returns = returns[~returns['order_id'].isin(orders['order_id'])]
-    print(f"Returns with invalid order_id count: {len(invalid_orderid_in_returns)}")
+    print(f"Returns with invalid order_id count: {count_invalid(returns['order_id'], order_ids)}")
 
     # return_items.return_id in returns.return_id
-    invalid_returnid_in_return_items = return_items[~return_items['return_id'].isin(returns['return_id'])]
-    print(f"Return items with invalid return_id count: {len(invalid_returnid_in_return_items)}")
+    print(f"Return items with invalid return_id count: {count_invalid(return_items['return_id'], return_ids)}")
 
     # return_items.order_id in orders.order_id
-    invalid_orderid_in_return_items = return_items[~return_items['order_id'].isin(orders['order_id'])]
-    print(f"Return items with invalid order_id count: {len(invalid_orderid_in_return_items)}")
+    print(f"Return items with invalid order_id count: {count_invalid(return_items['order_id'], order_ids)}")
 
     # product references
-    invalid_product_in_order_items = order_items[~order_items['product_id'].isin(product_catalog['product_id'])]
-    print(f"Order items with invalid product_id count: {len(invalid_product_in_order_items)}")
+    print(f"Order items with invalid product_id count: {count_invalid(order_items['product_id'], product_ids)}")
 
-    invalid_product_in_return_items = return_items[~return_items['product_id'].isin(product_catalog['product_id'])]
-    print(f"Return items with invalid product_id count: {len(invalid_product_in_return_items)}")
+    print(f"Return items with invalid product_id count: {count_invalid(return_items['product_id'], product_ids)}")
 
     # 3. Business logic checks
 
     # gross_total equals sum of order_items per order (before discounts)
-    order_items['item_total'] = order_items['quantity'] * order_items['unit_price']
-    order_totals_calc = order_items.groupby('order_id')['item_total'].sum().reset_index()
-    merged_orders = orders.merge(order_totals_calc, on='order_id', how='left')
-    merged_orders['gross_total_diff'] = abs(merged_orders['gross_total'] - merged_orders['item_total']).fillna(0)
-    order_total_mismatches = merged_orders[merged_orders['gross_total_diff'] > 0.01]
-    print(f"Orders with mismatched gross_total: {len(order_total_mismatches)}")
+    # Per-order item sums are mapped straight onto orders; orders without items are not counted
+    item_totals = (order_items['quantity'] * order_items['unit_price']).groupby(order_items['order_id']).sum()
+    gross_total_diff = (orders['gross_total'] - orders['order_id'].map(item_totals)).abs().fillna(0)
+    print(f"Orders with mismatched gross_total: {int((gross_total_diff > 0.01).sum())}")
 
     # refunded_amount equals sum of return_items per return
-    return_items['refund_total'] = return_items['refunded_amount']
-    return_totals_calc = return_items.groupby('return_id')['refund_total'].sum().reset_index()
-    merged_returns = returns.merge(return_totals_calc, on='return_id', how='left')
-    merged_returns['refund_diff'] = abs(merged_returns['refunded_amount'] - merged_returns['refund_total']).fillna(0)
-    return_total_mismatches = merged_returns[merged_returns['refund_diff'] > 0.01]
-    print(f"Returns with mismatched refunded_amount: {len(return_total_mismatches)}")
+    refund_totals = return_items.groupby('return_id')['refunded_amount'].sum()
+    refund_diff = (returns['refunded_amount'] - returns['return_id'].map(refund_totals)).abs().fillna(0)
+    print(f"Returns with mismatched refunded_amount: {int((refund_diff > 0.01).sum())}")
 
     # Return dates >= order dates
     returns_with_order_dates = returns.merge(orders[['order_id', 'order_date']], on='order_id', how='left')
-    returns_with_order_dates['order_date'] = pd.to_datetime(returns_with_order_dates['order_date'])
-    returns_with_order_dates['return_date'] = pd.to_datetime(returns_with_order_dates['return_date'])
+    # Both date columns were parsed at read time (see READ_OPTIONS)
     invalid_dates = returns_with_order_dates[
         returns_with_order_dates['return_date'] < returns_with_order_dates['order_date']
     ]
     print(f"Returns with return_date before order_date: {len(invalid_dates)}")
 
     # Agent assignment check summary (basic)
-    orders_agents = orders.groupby(['order_channel', 'agent_id']).size()
-    returns_agents = returns.groupby(['return_channel', 'agent_id']).size()
+    # observed=True tallies only the label pairs that occur, not the cross product of categories
+    orders_agents = orders.groupby(['order_channel', 'agent_id'], observed=True).size()
+    returns_agents = returns.groupby(['return_channel', 'agent_id'], observed=True).size()
     print("\nOrders agent assignment counts:\n", orders_agents)
     print("\nReturns agent assignment counts:\n", returns_agents)
 
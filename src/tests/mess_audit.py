@@ -2,6 +2,13 @@ import argparse
 import os
 import pandas as pd
 
+try:
+    import pyarrow  # noqa: F401
+    # pyarrow's multithreaded CSV reader is several times faster than the default C parser
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pyarrow is optional; fall back to pandas' C parser
+    CSV_ENGINE = "c"
+
 # Names of CSV files to audit
 TABLE_NAMES = [
     'orders.csv',
@@ -20,20 +27,24 @@ EXCLUDE_COLS = {
     'order_items.csv': {'order_id', 'unit_price', 'quantity'},
 }
 
-def has_messiness(val):
-    if pd.isna(val):
-        return True
-    if isinstance(val, str):
-        if val != val.strip():
-            return True
-        if val.lower() != val and val.upper() != val:
-            return True
-    return False
+def messiness_mask(series: pd.Series) -> pd.Series:
+    """Flags nulls, plus strings with stray whitespace or mixed casing, using vectorized string ops."""
+    mask = series.isna()
+    if pd.api.types.is_string_dtype(series):
+        text = series
+    elif series.dtype == object:
+        # Mixed columns (e.g. booleans with injected nulls): only the string values are style-checked
+        text = series[series.map(type).eq(str)]
+    else:
+        return mask
+    stripped = text.str.strip() != text
+    mixed_case = (text.str.lower() != text) & (text.str.upper() != text)
+    return mask | (stripped | mixed_case).reindex(series.index, fill_value=False)
 
 def audit_file(filepath):
     filename = os.path.basename(filepath)
     print(f"\nAuditing {filename}...")
-    df = pd.read_csv(filepath)
+    df = pd.read_csv(filepath, engine=CSV_ENGINE)
     print(f"Columns in {filename}: {df.columns.tolist()}")
 
     exclude_cols = EXCLUDE_COLS.get(filename, set())
@@ -41,12 +52,15 @@ def audit_file(filepath):
     check_cols = [col for col in df.columns if col not in exclude_cols]
 
     messy_summary = {}
+    # Masks of the messy columns are kept so the samples below don't re-scan the column
+    messy_masks = {}
 
     for col in check_cols:
-        messy_mask = df[col].apply(has_messiness)
+        messy_mask = messiness_mask(df[col])
         messy_count = messy_mask.sum()
         if messy_count > 0:
             messy_summary[col] = messy_count
+            messy_masks[col] = messy_mask
 
     if not messy_summary:
         print("No messiness found in any audited columns.")
@@ -54,7 +68,7 @@ def audit_file(filepath):
         print(f"Found messiness in {len(messy_summary)} columns:")
         for col, count in messy_summary.items():
             print(f"- Column '{col}': {count} messy rows")
-            print(df.loc[df[col].apply(has_messiness), col].head(5))
+            print(df.loc[messy_masks[col], col].head(5))
             print()
 
 def main() -> None:
@@ -564,8 +564,10 @@ def big_audit_statistical_checks(orders, returns, messiness, config):
 
 ### --- Main ---
 
-def run_all_tests(data_dir: str, messiness: str, run_big_audit: bool = False, debug: bool = False):
-    config = Config()
+def run_all_tests(data_dir: str, messiness: str, run_big_audit: bool = False, debug: bool = False, config: Config = None):
+    # Callers running in-process can hand over their Config instead of re-parsing the YAML
+    if config is None:
+        config = Config()
 
     # Load all data into a dictionary of DataFrames
     dataframes = load_data(data_dir)
@@ -588,9 +590,9 @@ def run_all_tests(data_dir: str, messiness: str, run_big_audit: bool = False, de
     validate_repeat_purchase_propensity(dataframes, messiness, config, debug=debug)
 
     # Optionally run big audit tests
-    orders_dict = dataframes.get('orders', pd.DataFrame()).to_dict('records')
-    returns_dict = dataframes.get('returns', pd.DataFrame()).to_dict('records')
     if run_big_audit:
+        orders_dict = dataframes.get('orders', pd.DataFrame()).to_dict('records')
+        returns_dict = dataframes.get('returns', pd.DataFrame()).to_dict('records')
         big_audit_statistical_checks(orders_dict, returns_dict, messiness, config)
         # Add more big audit calls here as you integrate them
 
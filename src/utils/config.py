@@ -6,6 +6,9 @@ import yaml
 from pathlib import Path
 import os
 
+# Prefer libyaml's C-accelerated safe loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 class Config:
     def __init__(self, yaml_path=None):
         # Default path to YAML config
@@ -18,7 +21,7 @@ class Config:
 
     def _load_yaml(self):
         with open(self.yaml_path, 'r') as f:
-            self.raw_config = yaml.safe_load(f)
+            self.raw_config = yaml.load(f, Loader=YAML_LOADER)
         # Parse main sections
         self.row_generators = self.raw_config.get('row_generators', {})
         self.tables = self.raw_config.get('tables', [])